@@ -1,3 +1,5 @@
-from beancount_gmail.importer import GmailImporter
-
-GmailImporter = GmailImporter
+def __getattr__(name: str):
+    if name == 'GmailImporter':
+        from beancount_gmail.importer import GmailImporter
+        return GmailImporter
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,40 @@
+from typing import Iterable
+
+# Joins cells or strings into one text. It does not appear in emails, so nothing searched for can match across it
+SEPARATOR: str = "\x00"
+
+
+class KeywordScanner(object):
+    """ Finds whether any of a set of keywords appear in a text, or in the cells of a row """
+
+    def __init__(self, keywords: Iterable[str] = ()) -> None:
+        self._keywords: tuple[str, ...] = ()
+        self._cells: frozenset[str] = frozenset()
+        self.register(keywords)
+
+    @property
+    def keywords(self) -> tuple[str, ...]:
+        return self._keywords
+
+    def register(self, keywords: Iterable[str]) -> None:
+        """ Adds keywords to look for, after those already registered """
+        keywords = tuple(keywords)
+        for keyword in keywords:
+            if not keyword or SEPARATOR in keyword:
+                raise ValueError("Keywords must be non-empty and not contain the separator, got {!r}".format(keyword))
+        self._keywords = tuple(dict.fromkeys(self._keywords + keywords))
+        self._cells = frozenset(self._keywords)
+
+    def whole_cells(self, cells: Iterable[str]) -> set[str]:
+        """ Returns the keywords which are the whole of one of the cells """
+        return self._cells.intersection(cells)
+
+    def contains_any(self, text: str) -> bool:
+        """ Whether any of the keywords appear in the text, stopping at the first found """
+        for keyword in self._keywords:
+            if keyword in text:
+                return True
+        return False
+
+    def any_cell_contains_any(self, cells: Iterable[str]) -> bool:
+        return self.contains_any(SEPARATOR.join(cells))
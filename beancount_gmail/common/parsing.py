@@ -1,42 +1,139 @@
+import copy
 import re
+from typing import Iterator, Optional, Union
 
-from bs4 import BeautifulSoup
-from bs4.element import Tag, NavigableString
+from bs4 import SoupStrainer
+from bs4.element import Tag, NavigableString, Comment
+
+_CELLS: tuple[str, ...] = ('td', 'th')
+
+TABLES_AND_TITLE: SoupStrainer = SoupStrainer(['table', 'title'])
+
+_WHITE_SPACE_RE = re.compile('[ \n\t\xa0]{2,}|[\n\t\xa0]')
+
+
+def normalise_white_space(s: str) -> str:
+    """ Strips the string, turns newlines, tabs and non-breaking spaces into spaces and collapses runs of spaces """
+    return _WHITE_SPACE_RE.sub(' ', s.strip())
+
+
+def leaf_tables(tag: Tag, strip_comments: bool = False) -> list[Tag]:
+    """ Returns, in document order, the tables within the tag which have no tables nested inside them """
+    tables = []
+    nested = set()
+    comments = []
+    open_tables = []
+    stack = []
+    element, children = tag, iter(tag.children)
+
+    while True:
+        for child in children:
+            if isinstance(child, Tag):
+                if child.name == 'table':
+                    if open_tables:
+                        nested.add(id(open_tables[-1]))
+                    tables.append(child)
+                    open_tables.append(child)
+                stack.append((element, children))
+                element, children = child, iter(child.children)
+                break
+            if strip_comments and isinstance(child, Comment):
+                comments.append(child)
+        else:
+            if open_tables and open_tables[-1] is element:
+                open_tables.pop()
+            if not stack:
+                break
+            element, children = stack.pop()
+
+    [comment.extract() for comment in comments]
+    return [table for table in tables if id(table) not in nested]
+
+
+def _row_cells(row: Tag) -> list[Union[str, Tag]]:
+    """ Returns the text of each cell in the row, with each table nested inside a cell standing in for its cells """
+    cells = []
+    stack = []
+    children, in_cell = iter(row.children), False
+
+    while True:
+        for child in children:
+            if not isinstance(child, Tag):
+                continue
+            if child.name == 'table' and in_cell:
+                cells.append(child)
+                continue
+            if child.name in _CELLS:
+                cells.append(extract_text(child, exclude_tables=True))
+            stack.append((children, in_cell))
+            children, in_cell = iter(child.children), in_cell or child.name in _CELLS
+            break
+        else:
+            if not stack:
+                return cells
+            children, in_cell = stack.pop()
+
+
+def _expand_nested_tables(cells: list[Union[str, Tag]]) -> list[str]:
+    return [text for cell in cells
+            for text in ((cell,) if isinstance(cell, str) else ('',) * len(cell.find_all(_CELLS)))]
 
 
 def extract_row_text(row: Tag) -> list[str]:
-    copy = BeautifulSoup(str(row), "html.parser")
-    cell_text = []
-    for cell in copy.find_all(['td', 'th']):
-        [table.decompose() for table in cell.find_all('table')]
-        cell_text.append(extract_text(cell))
-    return cell_text
-
-
-def extract_text(element: Tag) -> str:
-    text = ''
-    to_append = None
-
-    def remove_unwanted_white_spaces(s: str) -> str:
-        return re.sub(r' {2,}', ' ', re.sub(r'[\n\t]', r' ', re.sub(u'\xa0', ' ', s.strip())))
-
-    for elem in element.children:
-        if isinstance(elem, NavigableString):
-            if elem.strip():
-                s = remove_unwanted_white_spaces(elem.string.strip())
-                text += to_append + " " + s if to_append else s
-                to_append = None
-        elif elem.name == 'a' or elem.name == 'span':
-            to_append = to_append + " " + remove_unwanted_white_spaces(elem.text) if to_append \
-                else remove_unwanted_white_spaces(elem.text)
+    """ Returns the text of each cell in the row, leaving out tables nested inside cells without changing the row """
+    return _expand_nested_tables(_row_cells(row))
+
+
+def iter_row_text(tag: Tag, stop_at: Optional[str] = None, containing: Optional[str] = None) -> Iterator[list[str]]:
+    """ Lazily yields extract_row_text for each row within the tag, in document order """
+    rows = (descendant for descendant in tag.descendants if isinstance(descendant, Tag) and descendant.name == 'tr')
+    for position, row in enumerate(rows):
+        cells = _row_cells(row)
+        if stop_at is not None and stop_at in cells:
+            if position > 0:
+                return
+            stop_at = None
+        if containing is None or any(containing in cell for cell in cells if isinstance(cell, str)):
+            yield _expand_nested_tables(cells)
+
+
+def _element_text(element: Tag, exclude_tables: bool) -> str:
+    if exclude_tables and element.find('table') is not None:
+        element = copy.copy(element)
+        [table.decompose() for table in element.find_all('table')]
+    return element.text
+
+
+def extract_text(element: Tag, exclude_tables: bool = False) -> str:
+    """ Joins the text within the element, each a or span being joined to the text which follows it with a space """
+    stack = []
+    children, parts, to_append = iter(element.children), [], None
+
+    while True:
+        for elem in children:
+            if isinstance(elem, NavigableString):
+                if elem.strip():
+                    s = normalise_white_space(elem)
+                    parts.append(to_append + " " + s if to_append else s)
+                    to_append = None
+            elif exclude_tables and elem.name == 'table':
+                continue
+            elif elem.name == 'a' or elem.name == 'span':
+                elem_text = normalise_white_space(_element_text(elem, exclude_tables))
+                to_append = to_append + " " + elem_text if to_append else elem_text
+            else:
+                stack.append((children, parts, to_append))
+                children, parts, to_append = iter(elem.children), [], None
+                break
         else:
-            extracted = extract_text(elem)
+            if to_append:
+                parts.append(to_append)
+            extracted = ''.join(parts)
+            if not stack:
+                return extracted
+
+            children, parts, to_append = stack.pop()
             if to_append and extracted:
                 extracted = to_append + ' ' + extracted
                 to_append = None
-            text += extracted
-
-    if to_append:
-        text += to_append
-
-    return text
+            parts.append(extracted)
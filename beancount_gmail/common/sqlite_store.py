@@ -0,0 +1,20 @@
+import os
+import sqlite3
+import threading
+
+
+class SqliteStore(object):
+    """ A SQLite database in a directory, with a lock so that worker threads can share its connection """
+
+    def __init__(self, directory: str, file_name: str, tables: list[str]) -> None:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(directory, file_name), check_same_thread=False)
+        with self._connection:
+            for table in tables:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS {}".format(table))
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,18 @@
+import re
+from typing import Iterator, Pattern, Union
+
+from beancount_gmail.common.parsing import normalise_white_space
+
+
+def text_lines(text: str) -> list[str]:
+    """ Returns the non-empty lines of a plain text email with their white space normalised """
+    return [line for line in (normalise_white_space(line) for line in text.splitlines()) if line]
+
+
+def match_lines(expression: Union[str, Pattern], lines: list[str]) -> Iterator[re.Match]:
+    """ Yields the match of the expression against each line it matches """
+    expression = re.compile(expression) if isinstance(expression, str) else expression
+    for line in lines:
+        match = expression.search(line)
+        if match is not None:
+            yield match
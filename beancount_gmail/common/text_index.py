@@ -0,0 +1,35 @@
+from bisect import bisect_right
+from typing import Optional, Pattern
+
+from bs4.element import Tag, NavigableString
+
+from beancount_gmail.common.keywords import SEPARATOR
+
+
+class TextIndex(object):
+    """ Every string in a soup joined into one text, so a pattern can be searched for across the whole email at once """
+
+    def __init__(self, soup: Tag) -> None:
+        self._strings = [descendant for descendant in soup.descendants if isinstance(descendant, NavigableString)]
+        self._positions = {id(string): position for position, string in enumerate(self._strings)}
+        self._offsets = []
+        offset = 0
+        for string in self._strings:
+            self._offsets.append(offset)
+            offset += len(string) + len(SEPARATOR)
+        self.text = SEPARATOR.join(self._strings)
+
+    def _range(self, tag: Tag) -> tuple[int, int]:
+        positions = [self._positions[id(descendant)] for descendant in tag.descendants
+                     if isinstance(descendant, NavigableString)]
+        if not positions:
+            return 0, 0
+        return self._offsets[positions[0]], self._offsets[positions[-1]] + len(self._strings[positions[-1]])
+
+    def search(self, pattern: Pattern, within: Optional[Tag] = None) -> Optional[NavigableString]:
+        """ Returns the first string, within the tag if given, matching the compiled pattern """
+        start, end = (0, len(self.text)) if within is None else self._range(within)
+        match = pattern.search(self.text, start, end)
+        if match is None:
+            return None
+        return self._strings[bisect_right(self._offsets, match.start()) - 1]
@@ -0,0 +1,14 @@
+from datetime import date, datetime, time
+from typing import Union, Optional
+
+from pytz import tzinfo
+
+
+def as_timestamp(d: Union[date, datetime], local_time_zone: Optional[tzinfo] = None) -> float:
+    if type(d) == date or not d.tzinfo:
+        if not local_time_zone:
+            raise ValueError("A local time zone must be specified if you are using dates or timezone naive datetimes")
+        if type(d) == date:
+            d = datetime.combine(d, time())
+        d = local_time_zone.localize(d)
+    return d.timestamp()
@@ -1,38 +1,80 @@
 from datetime import timedelta
 from functools import wraps
-from typing import Union
+from typing import Union, Optional
 
-import gmails
 from beancount.core.data import Transaction
 
-from beancount_gmail.downloading_and_matching import download_and_match_transactions
-from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER
+from beancount_gmail.message_cache import DEFAULT_MESSAGE_CACHE_SIZE, check_message_cache_options
+from beancount_gmail.retrieval import create_retriever, MessageRetriever
 
 _RETRIEVER_CACHE = dict()
 
+_RECEIPT_CACHE = dict()
+
 
 def _add_email_details(parsers: Union[EmailParser, list[EmailParser]],
                        email_address: str,
                        credentials_directory: str,
                        postage_account: str,
                        transactions: list[Transaction],
-                       search_delta: timedelta = timedelta()) -> None:
-    retriever = _RETRIEVER_CACHE.setdefault((email_address, credentials_directory),
-                                            gmails.retriever.Retriever('beancount-import-gmail',
-                                                                       email_address,
-                                                                       credentials_directory))
-    download_and_match_transactions(parsers, retriever, transactions, postage_account, search_delta)
+                       *,
+                       search_delta: timedelta = timedelta(),
+                       message_cache_directory: Optional[str] = None,
+                       message_cache_size: int = DEFAULT_MESSAGE_CACHE_SIZE,
+                       workers: int = 1,
+                       combine_queries: bool = False,
+                       retriever: Optional[MessageRetriever] = None,
+                       incremental_sync: bool = False,
+                       extraction_processes: int = 0,
+                       tree_builder: str = DEFAULT_TREE_BUILDER,
+                       compact_receipts: bool = False) -> None:
+    from beancount_gmail.downloading_and_matching import download_and_match_transactions
+    from beancount_gmail.receipt_cache import ReceiptCache
+
+    if retriever is None:
+        key = (email_address, credentials_directory, message_cache_directory, incremental_sync)
+        if key not in _RETRIEVER_CACHE:
+            _RETRIEVER_CACHE[key] = create_retriever(email_address, credentials_directory,
+                                                     message_cache_directory, message_cache_size, incremental_sync)
+        retriever = _RETRIEVER_CACHE[key]
+
+    receipt_cache = None
+    if message_cache_directory is not None:
+        if message_cache_directory not in _RECEIPT_CACHE:
+            _RECEIPT_CACHE[message_cache_directory] = ReceiptCache(message_cache_directory)
+        receipt_cache = _RECEIPT_CACHE[message_cache_directory]
+
+    download_and_match_transactions(parsers, retriever, transactions, postage_account=postage_account,
+                                    search_delta=search_delta, receipt_cache=receipt_cache, workers=workers,
+                                    combine_queries=combine_queries, extraction_processes=extraction_processes,
+                                    tree_builder=tree_builder, compact_receipts=compact_receipts)
 
 
 def gmail_import(parsers: Union[EmailParser, list[EmailParser]], email_address: str, credentials_directory: str,
                  postage_account: str,
-                 search_delta: timedelta = timedelta()):
+                 search_delta: timedelta = timedelta(),
+                 message_cache_directory: Optional[str] = None,
+                 message_cache_size: int = DEFAULT_MESSAGE_CACHE_SIZE,
+                 workers: int = 1,
+                 combine_queries: bool = False,
+                 retriever: Optional[MessageRetriever] = None,
+                 incremental_sync: bool = False,
+                 extraction_processes: int = 0,
+                 tree_builder: str = DEFAULT_TREE_BUILDER,
+                 compact_receipts: bool = False):
+    check_message_cache_options(message_cache_directory, incremental_sync)
+
     def decorator(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
             transactions = func(self, *args, **kwargs)
-            _add_email_details(parsers, email_address, credentials_directory,
-                               postage_account, transactions, search_delta)
+            _add_email_details(parsers, email_address, credentials_directory, postage_account, transactions,
+                               search_delta=search_delta, message_cache_directory=message_cache_directory,
+                               message_cache_size=message_cache_size, workers=workers,
+                               combine_queries=combine_queries, retriever=retriever,
+                               incremental_sync=incremental_sync, extraction_processes=extraction_processes,
+                               tree_builder=tree_builder, compact_receipts=compact_receipts)
             return transactions
 
         return wrapper
@@ -1,45 +1,148 @@
+from bisect import bisect_right
 from builtins import isinstance
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta, date
-from typing import Union
+from mailbox import Message
+from typing import Union, Optional
 
-import gmails.retriever
 import pytz as pytz
 from beancount.core.data import Transaction
 
-from beancount_gmail.email_parser_protocol import EmailParser
-from beancount_gmail.email_processing import extract_receipts
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER
+from beancount_gmail.extraction_pool import ExtractionPool
+from beancount_gmail.email_processing import extract_receipts, get_message_date
 from beancount_gmail.receipt import Receipt
+from beancount_gmail.receipt_batch import ReceiptBatch
+from beancount_gmail.receipt_cache import ReceiptCache
+from beancount_gmail.receipt_matching import ReceiptMatcher, within_search_window
+from beancount_gmail.retrieval import MessageRetriever, shared_retriever
+from beancount_gmail.search_query import combine_search_queries, MessageDispatcher, SearchQuery
+
+Receipts = Union[list[Receipt], ReceiptBatch]
 
 
 def download_and_match_transactions(parsers: Union[EmailParser, list[EmailParser]],
-                                    retriever: gmails.retriever.Retriever,
+                                    retriever: MessageRetriever,
                                     transactions: list[Transaction],
                                     postage_account: str,
-                                    search_delta: timedelta = timedelta()) -> None:
-    if isinstance(parsers, list):
-        for parser in parsers:
-            download_and_match_transactions_for_parser(parser, retriever, transactions, postage_account, search_delta)
-    elif isinstance(parsers, EmailParser):
-        download_and_match_transactions_for_parser(parsers, retriever, transactions, postage_account, search_delta)
+                                    search_delta: timedelta = timedelta(),
+                                    *,
+                                    receipt_cache: Optional[ReceiptCache] = None,
+                                    workers: int = 1,
+                                    combine_queries: bool = False,
+                                    extraction_processes: int = 0,
+                                    tree_builder: str = DEFAULT_TREE_BUILDER,
+                                    compact_receipts: bool = False) -> None:
+    if isinstance(parsers, EmailParser):
+        parsers = [parsers]
+    elif not isinstance(parsers, list):
+        return
+
+    with ExtractionPool(parsers, extraction_processes, tree_builder) if extraction_processes > 1 \
+            else nullcontext() as pool:
+        def download(parser: EmailParser) -> tuple[list[Transaction], Receipts]:
+            return download_receipts_for_parser(parser, retriever, transactions, search_delta, receipt_cache, pool,
+                                                tree_builder, compact_receipts)
+
+        if combine_queries and len(parsers) > 1:
+            downloads = download_receipts_for_parsers(parsers, retriever, transactions, search_delta, receipt_cache,
+                                                      pool, tree_builder, compact_receipts)
+        elif workers > 1 and len(parsers) > 1:
+            retriever = shared_retriever(retriever)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                downloads = list(executor.map(download, parsers))
+        else:
+            downloads = list(map(download, parsers))
+
+    for filtered_transactions, receipts in downloads:
+        match_transactions(filtered_transactions, receipts, postage_account, search_delta)
 
 
 def download_and_match_transactions_for_parser(parser: EmailParser,
-                                               retriever: gmails.retriever.Retriever,
+                                               retriever: MessageRetriever,
                                                transactions: list[Transaction],
                                                postage_account: str,
-                                               search_delta: timedelta = timedelta()) -> None:
+                                               search_delta: timedelta = timedelta(),
+                                               *,
+                                               receipt_cache: Optional[ReceiptCache] = None,
+                                               tree_builder: str = DEFAULT_TREE_BUILDER) -> None:
+    filtered_transactions, receipts = download_receipts_for_parser(parser, retriever, transactions, search_delta,
+                                                                   receipt_cache, tree_builder=tree_builder)
+    match_transactions(filtered_transactions, receipts, postage_account, search_delta)
+
+
+def download_receipts_for_parser(parser: EmailParser,
+                                 retriever: MessageRetriever,
+                                 transactions: list[Transaction],
+                                 search_delta: timedelta = timedelta(),
+                                 receipt_cache: Optional[ReceiptCache] = None,
+                                 extraction_pool: Optional[ExtractionPool] = None,
+                                 tree_builder: str = DEFAULT_TREE_BUILDER,
+                                 compact_receipts: bool = False) \
+        -> tuple[list[Transaction], Receipts]:
     filtered_transactions = list(filter(parser.transaction_filter, transactions))
+    receipts = ReceiptBatch() if compact_receipts else []
+    if len(filtered_transactions) == 0:
+        return filtered_transactions, receipts
+
+    for min_date, max_date in get_search_windows(filtered_transactions, search_delta):
+        receipts.extend(download_email_receipts(parser, retriever, min_date, max_date, receipt_cache, extraction_pool,
+                                                tree_builder, compact_receipts))
+    return filtered_transactions, receipts
+
+
+def download_receipts_for_parsers(parsers: list[EmailParser],
+                                  retriever: MessageRetriever,
+                                  transactions: list[Transaction],
+                                  search_delta: timedelta = timedelta(),
+                                  receipt_cache: Optional[ReceiptCache] = None,
+                                  extraction_pool: Optional[ExtractionPool] = None,
+                                  tree_builder: str = DEFAULT_TREE_BUILDER,
+                                  compact_receipts: bool = False) \
+        -> list[tuple[list[Transaction], Receipts]]:
+    """ Retrieves the emails for every parser with one combined query, handing each email to the parsers it is for """
+    filtered_transactions = [list(filter(parser.transaction_filter, transactions)) for parser in parsers]
+    search_windows = [get_search_windows(filtered, search_delta) for filtered in filtered_transactions]
+    messages = [[] for _ in parsers]
+
+    active = [position for position, filtered in enumerate(filtered_transactions) if filtered]
+    combined = [position for position in active if SearchQuery(parsers[position].search_query()).answerable()]
+    for position in active:
+        if position not in combined:
+            for min_date, max_date in search_windows[position]:
+                messages[position].extend(retriever.get_messages_for_date_range(
+                    parsers[position].search_query(), min_date, max_date, _EUROPE_LONDON_TZ))
+
+    if combined:
+        query = combine_search_queries([parsers[position].search_query() for position in combined])
+        dispatcher = MessageDispatcher([parsers[position].search_query() for position in combined])
+
+        for min_date, max_date in merge_search_windows([window for position in combined
+                                                        for window in search_windows[position]]):
+            for email in retriever.get_messages_for_date_range(query, min_date, max_date, _EUROPE_LONDON_TZ):
+                email_date = get_message_date(email).astimezone(_EUROPE_LONDON_TZ).date()
+                for position in [combined[match] for match in dispatcher.dispatch(email)]:
+                    if within_search_windows(email_date, search_windows[position]):
+                        messages[position].append(email)
+
+    receipts = [extract_all_receipts(parser, parser_messages, receipt_cache, extraction_pool, tree_builder,
+                                     compact_receipts)
+                for parser, parser_messages in zip(parsers, messages)]
+    return list(zip(filtered_transactions, receipts))
+
+
+def match_transactions(filtered_transactions: list[Transaction], receipts: Receipts, postage_account: str,
+                       search_delta: timedelta = timedelta()) -> None:
     if len(filtered_transactions) == 0:
         return
 
-    min_date, max_date = get_search_dates(filtered_transactions, search_delta)
-
-    receipts = download_email_receipts(parser, retriever, min_date, max_date)
+    matcher = ReceiptMatcher(receipts, search_delta)
     for transaction in filtered_transactions:
-        for receipt in receipts.copy():
-            if isinstance(transaction, Transaction) and pairs_match(transaction, receipt, search_delta):
-                receipts.remove(receipt)
-                receipt.append_postings(transaction, postage_account)
+        for position in matcher.match_positions(transaction):
+            matcher.append_postings(position, transaction, postage_account)
+
+    receipts = matcher.unmatched()
 
     if len(receipts) > 0:
         print("Warning: Failed to match {} receipts".format(len(receipts)))
@@ -63,25 +166,78 @@ def get_search_dates(transactions: list[Transaction], search_delta: timedelta =
     return min(dates) - search_delta, max(dates) + timedelta(days=1) + search_delta
 
 
-def download_email_receipts(parser: EmailParser, retriever: gmails.retriever.Retriever,
-                            min_date: Union[date, datetime], max_date: Union[date, datetime]) -> list[Receipt]:
-    return [receipt for email in
-            retriever.get_messages_for_date_range(parser.search_query(), min_date, max_date, _EUROPE_LONDON_TZ)
-            for receipt in extract_receipts(parser, email)]
+def get_search_windows(transactions: list[Transaction], search_delta: timedelta = timedelta()) \
+        -> list[tuple[datetime.date, datetime.date]]:
+    return merge_search_windows([(transaction.date - search_delta, transaction.date + timedelta(days=1) + search_delta)
+                                 for transaction in transactions if isinstance(transaction, Transaction)])
+
+
+def merge_search_windows(windows: list[tuple[datetime.date, datetime.date]]) \
+        -> list[tuple[datetime.date, datetime.date]]:
+    merged = []
+    for min_date, max_date in sorted(windows):
+        if merged and min_date <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(max_date, merged[-1][1]))
+        else:
+            merged.append((min_date, max_date))
+    return merged
+
+
+def within_search_windows(day: datetime.date, windows: list[tuple[datetime.date, datetime.date]]) -> bool:
+    position = bisect_right(windows, (day, date.max)) - 1
+    return position >= 0 and windows[position][0] <= day < windows[position][1]
+
+
+def download_email_receipts(parser: EmailParser, retriever: MessageRetriever,
+                            min_date: Union[date, datetime], max_date: Union[date, datetime],
+                            receipt_cache: Optional[ReceiptCache] = None,
+                            extraction_pool: Optional[ExtractionPool] = None,
+                            tree_builder: str = DEFAULT_TREE_BUILDER,
+                            compact_receipts: bool = False) -> Receipts:
+    return extract_all_receipts(parser, retriever.get_messages_for_date_range(parser.search_query(), min_date,
+                                                                              max_date, _EUROPE_LONDON_TZ),
+                                receipt_cache, extraction_pool, tree_builder, compact_receipts)
+
+
+def extract_all_receipts(parser: EmailParser, messages: list[Message],
+                         receipt_cache: Optional[ReceiptCache] = None,
+                         extraction_pool: Optional[ExtractionPool] = None,
+                         tree_builder: str = DEFAULT_TREE_BUILDER,
+                         compact_receipts: bool = False) -> Receipts:
+    """ Extracts the receipts from the messages in order, using cached receipts and the pool when given """
+    messages = filter_message_headers(parser, messages)
+    receipts = ReceiptBatch() if compact_receipts else []
+    if extraction_pool is None:
+        extract = extract_receipts if receipt_cache is None else receipt_cache.extract_receipts
+        for message in messages:
+            receipts.extend(extract(parser, message, tree_builder))
+        return receipts
+
+    cached = [None if receipt_cache is None else receipt_cache.get(parser, message, tree_builder)
+              for message in messages]
+    missing = [message for message, message_receipts in zip(messages, cached) if message_receipts is None]
+    extracted = extraction_pool.extract_receipts(parser, missing)
+
+    for message, message_receipts in zip(messages, cached):
+        if message_receipts is None:
+            message_receipts = next(extracted)
+            if message_receipts is None:
+                continue
+            if receipt_cache is not None:
+                receipt_cache.put(parser, message, message_receipts, tree_builder)
+        receipts.extend(message_receipts)
+    return receipts
 
 
 _EUROPE_LONDON_TZ: pytz.tzinfo = pytz.timezone('Europe/London')
 
 
+def filter_message_headers(parser: EmailParser, messages: list[Message]) -> list[Message]:
+    return [message for message in messages if parser.header_filter(message)]
+
+
 def pairs_match(transaction: Transaction, receipt: Receipt, search_delta: timedelta = timedelta()) -> bool:
-    t_dates = {transaction.date}
-    r_dates = {receipt.receipt_date.date()}
-    while search_delta.days > 0:
-        r_dates.add(receipt.receipt_date.date() + search_delta)
-        r_dates.add(receipt.receipt_date.date() - search_delta)
-        search_delta = search_delta - timedelta(days=1)
-
-    if len(t_dates.intersection(r_dates)) > 0:
+    if within_search_window(transaction.date, receipt.receipt_date.date(), search_delta):
         if transaction.postings and transaction.postings[0].units == -receipt.total:
             return True
     return False
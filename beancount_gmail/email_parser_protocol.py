@@ -1,12 +1,22 @@
+from __future__ import annotations
+
+import copy
 import re
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Union, Callable, Optional
+from mailbox import Message
+from typing import Any, Union, Callable, Optional, TYPE_CHECKING
 
 from beancount.core.data import Transaction
-from bs4 import BeautifulSoup
 
 from beancount_gmail.receipt import Receipt
+from beancount_gmail.search_query import header_text
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+
+DEFAULT_TREE_BUILDER: str = "html.parser"
 
 
 def re_filter(expression: str, re_flags: int = 0) -> Callable:
@@ -29,17 +39,68 @@ def transaction_filter(filter_param: Optional[Union[str, Callable]], transaction
     raise Exception("Do not understand transaction_filter which should be a string or a function")
 
 
+def header_re_filter(expression: str, header: str = "Subject", re_flags: int = 0) -> Callable:
+    return lambda message: re.search(expression, header_text(message, header), re_flags) is not None
+
+
+def header_filter(header_filter_param: Optional[Union[str, Callable]], message: Message) -> Any:
+    if not header_filter_param:
+        return True
+
+    if isinstance(header_filter_param, str):
+        return header_filter_param in header_text(message, "Subject")
+
+    if isinstance(header_filter_param, Callable):
+        return header_filter_param(message)
+
+    raise Exception("Do not understand header_filter which should be a string or a function")
+
+
 class EmailParser(ABC):
-    def __init__(self, filter_param: Union[str, Callable] = None):
+    def __init__(self, filter_param: Union[str, Callable] = None, tree_builder: Optional[str] = None,
+                 header_filter_param: Union[str, Callable] = None):
         self._filter_param = filter_param
+        self._tree_builder = tree_builder
+        self._header_filter_param = header_filter_param
 
     @abstractmethod
     def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
         """ Given a soup instance, the parser is responsible for returning a list of Receipts """
 
+    def extract_receipts_from_text(self, message_date: datetime, text: str) -> Optional[list[Receipt]]:
+        """ Given the decoded body of a plain text email, returns Receipts, or None to parse it into soup instead """
+        return None
+
     @abstractmethod
     def search_query(self) -> str:
         """ Returns the GMail search string """
 
+    def version(self) -> str:
+        """ Identifies the parsing logic, change it whenever the receipts extracted from an email would change """
+        return "1"
+
+    def tree_builder(self) -> Optional[str]:
+        """ The BeautifulSoup tree builder, such as "lxml", to parse emails with, or None for the importer's default """
+        return self._tree_builder
+
+    def parse_only(self) -> Optional[SoupStrainer]:
+        """ Restricts the soup to the parts of the email the parser reads, or None to parse the whole email """
+        return None
+
     def transaction_filter(self, transaction: Transaction) -> Any:
         return transaction_filter(self._filter_param, transaction)
+
+    def header_filter(self, message: Message) -> Any:
+        """ Whether an email may hold a receipt, judged from its headers alone before its payload is decoded """
+        return header_filter(self._header_filter_param, message)
+
+    def for_worker(self) -> EmailParser:
+        """ A copy to extract receipts in another process, without the filters, which often cannot be pickled """
+        parser = copy.copy(self)
+        parser._filter_param = None
+        parser._header_filter_param = None
+        return parser
+
+
+def parser_name(parser: EmailParser) -> str:
+    return "{}.{}".format(type(parser).__module__, type(parser).__qualname__)
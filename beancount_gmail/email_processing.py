@@ -1,12 +1,14 @@
 import datetime
 from datetime import tzinfo
+from functools import partial
 from mailbox import Message
+from typing import Iterator, Optional
 
 import bs4
 import pytz
 
 from beancount_gmail.debug_handling import maybe_write_debugging
-from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER
 from beancount_gmail.receipt import Receipt
 
 TIMEZONE: tzinfo = pytz.timezone("Europe/London")
@@ -16,41 +18,84 @@ class NoCharsetException(Exception):
     pass
 
 
+def tree_builder_for(parser: EmailParser, default_tree_builder: str = DEFAULT_TREE_BUILDER) -> str:
+    return parser.tree_builder() or default_tree_builder
+
+
 def extract_receipts_from_email(parser: EmailParser, message_date: datetime,
-                                message: Message) -> list[Receipt]:
-    return parser.extract_receipts(message_date, bs4.BeautifulSoup(message, "html.parser"))
+                                message: Message, tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
+    return parser.extract_receipts(message_date, bs4.BeautifulSoup(message, tree_builder,
+                                                                   parse_only=parser.parse_only()))
+
 
+def extract_receipts_from_text(parser: EmailParser, message_date: datetime, text: str,
+                               tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
+    receipts = parser.extract_receipts_from_text(message_date, text)
+    if receipts is None:
+        return extract_receipts_from_email(parser, message_date, text, tree_builder)
+    return receipts
 
-def process_message_text(parser: EmailParser, message_date: datetime, message: Message) -> list[Receipt]:
+
+def process_message_text(parser: EmailParser, message_date: datetime, message: Message,
+                         tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
     if message.get_content_type() == "text/html":
-        return maybe_write_debugging(extract_receipts_from_email, "html", parser, message_date,
+        return maybe_write_debugging(partial(extract_receipts_from_email, tree_builder=tree_builder), "html", parser,
+                                     message_date,
                                      message.get_payload(decode=True).decode(message.get_content_charset()))
     elif message.get_content_type() == "text/plain":
-        return maybe_write_debugging(extract_receipts_from_email, "txt", parser, message_date,
+        return maybe_write_debugging(partial(extract_receipts_from_text, tree_builder=tree_builder), "txt", parser,
+                                     message_date,
                                      message.get_payload(decode=True).decode(message.get_content_charset()))
     else:
         return []
 
 
-def process_message_payload(message: Message, parser: EmailParser, message_date: datetime) -> list[Receipt]:
+def text_parts(message: Message) -> Iterator[Message]:
+    """ Yields the text parts of the message depth first, without descending into or decoding attachments """
+    if message.get_content_disposition() == "attachment":
+        return
     if message.is_multipart():
-        receipts = []
-        [receipts.extend(process_message_text(parser, message_date, part))
-         for part in message.get_payload()
-         if "text/html" in part.get_content_type()]
-        return receipts
-    else:
-        return process_message_text(parser, message_date, message)
+        for part in message.get_payload():
+            yield from text_parts(part)
+    elif message.get_content_maintype() == "text":
+        yield message
+
+
+def find_receipt_part(message: Message) -> Optional[Message]:
+    """ Returns the first html part of the message, or its first plain text part if it has no html """
+    text_part = None
+    for part in text_parts(message):
+        if part.get_content_type() == "text/html":
+            return part
+        if text_part is None and part.get_content_type() == "text/plain":
+            text_part = part
+    return text_part
+
+
+def process_message_payload(message: Message, parser: EmailParser, message_date: datetime,
+                            tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
+    part = find_receipt_part(message)
+    if part is None:
+        return []
+    return process_message_text(parser, message_date, part, tree_builder)
 
 
 def get_message_date(message: Message) -> datetime:
     return datetime.datetime.strptime(message.get("Date"), "%a, %d %b %Y %H:%M:%S %z")
 
 
-def extract_receipts(parser: EmailParser, message: Message) -> list[Receipt]:
+def try_extract_receipts(parser: EmailParser, message: Message,
+                         default_tree_builder: str = DEFAULT_TREE_BUILDER) -> Optional[list[Receipt]]:
+    """ Returns the receipts in the message, or None when it failed to parse """
     message_date = get_message_date(message)
 
     try:
-        return process_message_payload(message, parser, message_date)
+        return process_message_payload(message, parser, message_date, tree_builder_for(parser, default_tree_builder))
     except Exception:
-        return []
+        return None
+
+
+def extract_receipts(parser: EmailParser, message: Message,
+                     default_tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
+    receipts = try_extract_receipts(parser, message, default_tree_builder)
+    return [] if receipts is None else receipts
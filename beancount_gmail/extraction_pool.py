@@ -0,0 +1,61 @@
+import email
+import email.policy
+from concurrent.futures import ProcessPoolExecutor
+from mailbox import Message
+from typing import Iterator, Optional
+
+from beancount_gmail import debug_handling
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER
+from beancount_gmail.email_processing import try_extract_receipts
+from beancount_gmail.receipt import Receipt, ReceiptRecord, receipt_from_record
+
+DEFAULT_CHUNK_SIZE: int = 8
+
+_WORKER_PARSERS: list[EmailParser] = []
+
+_WORKER_TREE_BUILDER: str = DEFAULT_TREE_BUILDER
+
+
+def _initialise_worker(parsers: list[EmailParser], tree_builder: str, write_debug: bool) -> None:
+    global _WORKER_PARSERS, _WORKER_TREE_BUILDER
+    _WORKER_PARSERS = parsers
+    _WORKER_TREE_BUILDER = tree_builder
+    debug_handling.WRITE_DEBUG = write_debug
+
+
+def _extract_receipt_records(task: tuple[int, bytes]) -> Optional[list[ReceiptRecord]]:
+    position, raw_message = task
+    message = email.message_from_bytes(raw_message, policy=email.policy.compat32)
+    receipts = try_extract_receipts(_WORKER_PARSERS[position], message, _WORKER_TREE_BUILDER)
+    return None if receipts is None else [receipt.to_record() for receipt in receipts]
+
+
+class ExtractionPool(object):
+    """ Extracts receipts in a pool of processes which each hold a copy of the parsers """
+
+    def __init__(self, parsers: list[EmailParser], processes: int, tree_builder: str = DEFAULT_TREE_BUILDER,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self._positions = {id(parser): position for position, parser in enumerate(parsers)}
+        self._chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(max_workers=processes, initializer=_initialise_worker,
+                                             initargs=([parser.for_worker() for parser in parsers], tree_builder,
+                                                       debug_handling.WRITE_DEBUG))
+
+    def extract_receipts(self, parser: EmailParser, messages: list[Message]) -> Iterator[Optional[list[Receipt]]]:
+        """ Yields the receipts for each of the messages, in order, or None for those which failed to parse """
+        position = self._positions[id(parser)]
+        records = self._executor.map(_extract_receipt_records,
+                                     [(position, message.as_bytes()) for message in messages],
+                                     chunksize=self._chunk_size)
+        return (None if message_records is None else [receipt_from_record(record) for record in message_records]
+                for message_records in records)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ExtractionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> Optional[bool]:
+        self.close()
+        return None
@@ -1,32 +1,76 @@
+from __future__ import annotations
+
 import datetime
 import os
 from datetime import timedelta
-from typing import Optional, Union
+from typing import Optional, Union, TYPE_CHECKING
 
-import gmails.retriever
 from beancount.core import data
 from beancount.core.data import Entries
 from beangulp.importer import Importer
 
-from beancount_gmail.downloading_and_matching import download_and_match_transactions
-from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER
+from beancount_gmail.message_cache import DEFAULT_MESSAGE_CACHE_SIZE, check_message_cache_options
+from beancount_gmail.retrieval import MessageRetriever, create_retriever
+
+if TYPE_CHECKING:
+    from beancount_gmail.receipt_cache import ReceiptCache
 
 
 class GmailImporter(Importer):
     def __init__(self, delegate: Importer, parsers: Union[EmailParser, list[EmailParser]], postage_account: str, gmail_address: str,
                  secrets_directory: str = os.path.dirname(os.path.realpath(__file__)),
-                 search_delta: timedelta = timedelta()) -> None:
+                 search_delta: timedelta = timedelta(),
+                 message_cache_directory: Optional[str] = None,
+                 message_cache_size: int = DEFAULT_MESSAGE_CACHE_SIZE,
+                 workers: int = 1,
+                 combine_queries: bool = False,
+                 retriever: Optional[MessageRetriever] = None,
+                 incremental_sync: bool = False,
+                 extraction_processes: int = 0,
+                 tree_builder: str = DEFAULT_TREE_BUILDER,
+                 compact_receipts: bool = False) -> None:
+        check_message_cache_options(message_cache_directory, incremental_sync)
+        self._workers = workers
+        self._compact_receipts = compact_receipts
+        self._extraction_processes = extraction_processes
+        self._tree_builder = tree_builder
+        self._combine_queries = combine_queries
         self._search_delta = search_delta
         self._delegate = delegate
         self._parsers = parsers
         self._postage_account = postage_account
         self._gmail_address = gmail_address
-        self._retriever = gmails.retriever.Retriever('beancount-import-gmail', self._gmail_address, secrets_directory)
+        self._secrets_directory = secrets_directory
+        self._message_cache_directory = message_cache_directory
+        self._message_cache_size = message_cache_size
+        self._incremental_sync = incremental_sync
+        self._retriever = retriever
+        self._receipt_cache = None
+
+    def _get_retriever(self) -> MessageRetriever:
+        if self._retriever is None:
+            self._retriever = create_retriever(self._gmail_address, self._secrets_directory,
+                                               self._message_cache_directory, self._message_cache_size,
+                                               self._incremental_sync)
+        return self._retriever
+
+    def _get_receipt_cache(self) -> Optional[ReceiptCache]:
+        if self._receipt_cache is None and self._message_cache_directory is not None:
+            from beancount_gmail.receipt_cache import ReceiptCache
+            self._receipt_cache = ReceiptCache(self._message_cache_directory)
+        return self._receipt_cache
 
     def extract(self, filepath: str, existing_entries: Entries = None) -> Entries:
+        from beancount_gmail.downloading_and_matching import download_and_match_transactions
+
         transactions = self._delegate.extract(filepath, existing_entries)
-        download_and_match_transactions(self._parsers, self._retriever, transactions,
-                                        self._postage_account, self._search_delta)
+        download_and_match_transactions(self._parsers, self._get_retriever(), transactions,
+                                        postage_account=self._postage_account, search_delta=self._search_delta,
+                                        receipt_cache=self._get_receipt_cache(), workers=self._workers,
+                                        combine_queries=self._combine_queries,
+                                        extraction_processes=self._extraction_processes,
+                                        tree_builder=self._tree_builder, compact_receipts=self._compact_receipts)
         return transactions
 
     def account(self, filepath: str) -> data.Account:
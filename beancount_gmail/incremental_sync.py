@@ -0,0 +1,119 @@
+import time
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from mailbox import Message
+from typing import Union
+
+import gmails.retriever
+from pytz import tzinfo
+
+from beancount_gmail.common.sqlite_store import SqliteStore
+from beancount_gmail.dates import as_timestamp
+from beancount_gmail.message_cache import CachingRetriever, MessageCache, decode_messages
+
+SYNC_STATE_FILE: str = "sync.sqlite"
+
+SYNC_MARGIN_SECONDS: float = 60 * 60
+
+
+class SyncState(SqliteStore):
+    """ Records, per email address and search query, which time ranges have been listed and the messages found """
+
+    def __init__(self, directory: str) -> None:
+        super().__init__(directory, SYNC_STATE_FILE,
+                         ["synced (account TEXT NOT NULL, query TEXT NOT NULL, range_start REAL NOT NULL, "
+                          "range_end REAL NOT NULL)",
+                          "messages (account TEXT NOT NULL, query TEXT NOT NULL, id TEXT NOT NULL, "
+                          "timestamp REAL NOT NULL, PRIMARY KEY (account, query, id))"])
+
+    def gaps(self, account: str, query: str, start: float, end: float) -> list[tuple[float, float]]:
+        """ Returns the parts of the range from start to end which have not been synced yet """
+        with self._lock:
+            synced = self._connection.execute("SELECT range_start, range_end FROM synced "
+                                              "WHERE account = ? AND query = ? AND range_start < ? AND range_end > ? "
+                                              "ORDER BY range_start",
+                                              (account, query, end, start)).fetchall()
+        gaps = []
+        for synced_start, synced_end in synced:
+            if synced_start > start:
+                gaps.append((start, synced_start))
+            start = max(start, synced_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    def add_synced(self, account: str, query: str, start: float, end: float) -> None:
+        with self._lock, self._connection:
+            overlapping = self._connection.execute("SELECT range_start, range_end FROM synced "
+                                                   "WHERE account = ? AND query = ? "
+                                                   "AND range_start <= ? AND range_end >= ?",
+                                                   (account, query, end, start)).fetchall()
+            start = min([start] + [synced_start for synced_start, _ in overlapping])
+            end = max([end] + [synced_end for _, synced_end in overlapping])
+            self._connection.execute("DELETE FROM synced WHERE account = ? AND query = ? "
+                                     "AND range_start >= ? AND range_end <= ?",
+                                     (account, query, start, end))
+            self._connection.execute("INSERT INTO synced (account, query, range_start, range_end) VALUES (?, ?, ?, ?)",
+                                     (account, query, start, end))
+
+    def add_messages(self, account: str, query: str, messages: list[tuple[str, float]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO messages (account, query, id, timestamp) "
+                                         "VALUES (?, ?, ?, ?)",
+                                         [(account, query, message_id, timestamp) for message_id, timestamp in messages])
+
+    def message_ids(self, account: str, query: str, start: float, end: float) -> list[str]:
+        with self._lock:
+            return [row[0] for row in
+                    self._connection.execute("SELECT id FROM messages WHERE account = ? AND query = ? "
+                                             "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+                                             (account, query, start, end))]
+
+
+def _as_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def _clamped_timestamp(message: Message, start: float, end: float) -> float:
+    try:
+        timestamp = parsedate_to_datetime(message.get("Date")).timestamp()
+    except (TypeError, ValueError):
+        timestamp = start
+    return min(max(timestamp, start), end - 0.001)
+
+
+class SyncingRetriever(CachingRetriever):
+    """ A CachingRetriever which only lists the parts of a date range that earlier runs have not already listed """
+
+    def __init__(self, retriever: gmails.retriever.Retriever, cache: MessageCache, state: SyncState,
+                 account: str) -> None:
+        super().__init__(retriever, cache)
+        self._state = state
+        self._account = account
+
+    def _sync(self, search_query: str, start: float, end: float) -> None:
+        for gap_start, gap_end in self._state.gaps(self._account, search_query, start, end):
+            message_ids = self._message_ids(search_query, _as_datetime(gap_start), _as_datetime(gap_end))
+            raw_messages = self._raw_messages(message_ids)
+            synced_messages = []
+            for message_id, raw_message in raw_messages.items():
+                message = gmails.retriever.decode_message({'raw': raw_message})
+                if message is not None:
+                    synced_messages.append((message_id, _clamped_timestamp(message, gap_start, gap_end)))
+            self._state.add_messages(self._account, search_query, synced_messages)
+            self._state.add_synced(self._account, search_query, gap_start, gap_end)
+
+    def get_messages_for_date_range(self, search_query: str, after_date: Union[date, datetime],
+                                    before_date: Union[date, datetime],
+                                    local_time_zone: tzinfo = None) -> list[Message]:
+        start = as_timestamp(after_date, local_time_zone)
+        end = as_timestamp(before_date, local_time_zone)
+        settled = max(start, min(end, time.time() - SYNC_MARGIN_SECONDS))
+
+        self._sync(search_query, start, settled)
+        message_ids = self._state.message_ids(self._account, search_query, start, settled)
+        if settled < end:
+            message_ids += self._message_ids(search_query, _as_datetime(settled), _as_datetime(end))
+
+        message_ids = list(dict.fromkeys(message_ids))
+        return decode_messages(message_ids, self._raw_messages(message_ids))
@@ -0,0 +1,59 @@
+import email
+import email.policy
+import mailbox
+import os
+from bisect import bisect_left
+from datetime import date, datetime
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime
+from mailbox import Message
+from typing import Union
+
+from pytz import tzinfo
+
+from beancount_gmail.dates import as_timestamp
+from beancount_gmail.search_query import SearchQuery, message_text
+
+
+def open_mailbox(path: str) -> mailbox.Mailbox:
+    if os.path.isdir(path):
+        return mailbox.Maildir(path, factory=None, create=False)
+    return mailbox.mbox(path, factory=None, create=False)
+
+
+class MailboxRetriever(object):
+    """ Retrieves messages from a local mbox file or Maildir directory, such as a Google Takeout export """
+
+    def __init__(self, path: str) -> None:
+        self._mailbox = open_mailbox(path)
+        self._header_parser = BytesHeaderParser(policy=email.policy.compat32)
+
+        index = []
+        for key in self._mailbox.iterkeys():
+            headers = self._read_headers(key)
+            try:
+                index.append((parsedate_to_datetime(headers.get("Date")).timestamp(), key))
+            except (TypeError, ValueError):
+                continue
+        index.sort(key=lambda entry: entry[0])
+
+        self._timestamps = [timestamp for timestamp, _ in index]
+        self._keys = [key for _, key in index]
+
+    def _read_headers(self, key: Union[str, int]) -> Message:
+        with self._mailbox.get_file(key) as message_file:
+            return self._header_parser.parse(message_file, headersonly=True)
+
+    def get_messages_for_date_range(self, search_query: str, after_date: Union[date, datetime],
+                                    before_date: Union[date, datetime],
+                                    local_time_zone: tzinfo = None) -> list[Message]:
+        query = SearchQuery(search_query)
+        start = bisect_left(self._timestamps, as_timestamp(after_date, local_time_zone))
+        end = bisect_left(self._timestamps, as_timestamp(before_date, local_time_zone))
+
+        messages = [email.message_from_bytes(self._mailbox.get_bytes(key))
+                    for key in self._keys[start:end]
+                    if query.matches(self._read_headers(key))]
+        if query.answerable():
+            return messages
+        return [message for message in messages if query.matches(message, message_text(message))]
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+import zlib
+from datetime import date, datetime
+from mailbox import Message
+from typing import Optional, Union, TYPE_CHECKING
+
+from beancount_gmail.common.sqlite_store import SqliteStore
+
+if TYPE_CHECKING:
+    import gmails.retriever
+    from pytz import tzinfo
+
+MESSAGE_CACHE_FILE: str = "messages.sqlite"
+
+DEFAULT_MESSAGE_CACHE_SIZE: int = 256 * 1024 * 1024
+
+_BATCH_SIZE: int = 100
+
+_MISSING_MESSAGE_STATUSES: frozenset[int] = frozenset([404, 410])
+
+
+def check_message_cache_options(message_cache_directory: Optional[str], incremental_sync: bool = False) -> None:
+    """ Raises ValueError for options which keep their state in the message cache directory when there is none """
+    if incremental_sync and message_cache_directory is None:
+        raise ValueError("incremental_sync needs a message_cache_directory to keep its state in")
+
+
+class MessageCache(SqliteStore):
+    """ Compressed raw Gmail messages stored in SQLite, keyed by Gmail message id """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MESSAGE_CACHE_SIZE) -> None:
+        super().__init__(directory, MESSAGE_CACHE_FILE,
+                         ["messages (id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                          "accessed REAL NOT NULL)"])
+        self._max_size = max_size
+
+    def get(self, message_ids: list[str]) -> dict[str, str]:
+        """ Returns the raw, base64 encoded, message for every id that is in the cache """
+        found = dict()
+        with self._lock, self._connection:
+            for message_id in message_ids:
+                row = self._connection.execute("SELECT data FROM messages WHERE id = ?", (message_id,)).fetchone()
+                if row is not None:
+                    found[message_id] = zlib.decompress(row[0]).decode('ascii')
+            self._connection.executemany("UPDATE messages SET accessed = ? WHERE id = ?",
+                                         [(time.time(), message_id) for message_id in found])
+        return found
+
+    def put(self, raw_messages: dict[str, str]) -> None:
+        with self._lock, self._connection:
+            for message_id, raw in raw_messages.items():
+                data = zlib.compress(raw.encode('ascii'))
+                self._connection.execute("INSERT OR REPLACE INTO messages (id, data, size, accessed) "
+                                         "VALUES (?, ?, ?, ?)", (message_id, data, len(data), time.time()))
+            self._evict()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0]
+
+    def _evict(self) -> None:
+        excess = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0] \
+                 - self._max_size
+        if excess <= 0:
+            return
+
+        evicted = []
+        for message_id, size in self._connection.execute("SELECT id, size FROM messages ORDER BY accessed"):
+            if excess <= 0:
+                break
+            evicted.append((message_id,))
+            excess -= size
+        self._connection.executemany("DELETE FROM messages WHERE id = ?", evicted)
+
+
+def _download_raw_messages(retriever: gmails.retriever.Retriever, message_ids: list[str]) -> dict[str, str]:
+    """ Downloads the raw messages in batches, skipping messages which have been deleted since they were listed """
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import BatchHttpRequest
+
+    raw_messages = dict()
+    failures: dict[str, Exception] = dict()
+
+    def add_raw_message(request_id, response, exception) -> None:
+        if exception is not None:
+            failures[request_id] = exception
+        else:
+            raw_messages[response['id']] = response['raw']
+
+    message_ids = list(dict.fromkeys(message_ids))
+    service = retriever._get_service()
+    for start in range(0, len(message_ids), _BATCH_SIZE):
+        batch = BatchHttpRequest(callback=add_raw_message, batch_uri="https://www.googleapis.com/batch/gmail/v1")
+        for message_id in message_ids[start:start + _BATCH_SIZE]:
+            batch.add(service.users().messages().get(userId=retriever._email_address, id=message_id, format='raw'),
+                      request_id=message_id)
+        batch.execute()
+
+        missing = [message_id for message_id, exception in failures.items()
+                   if isinstance(exception, HttpError) and exception.resp.status in _MISSING_MESSAGE_STATUSES]
+        if missing:
+            print("Warning: skipped {} messages which no longer exist ({})".format(len(missing), ", ".join(missing)))
+        for message_id in missing:
+            del failures[message_id]
+        if failures:
+            raise next(iter(failures.values()))
+    return raw_messages
+
+
+class CachingRetriever(object):
+    """ Sits in front of a gmails Retriever, only downloading messages which are not already in the cache """
+
+    def __init__(self, retriever: gmails.retriever.Retriever, cache: MessageCache) -> None:
+        self._retriever = retriever
+        self._cache = cache
+
+    @property
+    def thread_safe(self) -> bool:
+        """ The cache is locked, so this is thread safe whenever the retriever in front of Gmail is """
+        return getattr(self._retriever, 'thread_safe', False)
+
+    def _message_ids(self, search_query: str, after_date: Union[date, datetime], before_date: Union[date, datetime],
+                     local_time_zone: tzinfo = None) -> list[str]:
+        return [message_id['id'] for message_ids in
+                self._retriever._list_messages_for_days(search_query, after_date, before_date, local_time_zone)
+                for message_id in message_ids]
+
+    def _raw_messages(self, message_ids: list[str]) -> dict[str, str]:
+        raw_messages = self._cache.get(message_ids)
+        missing = [message_id for message_id in message_ids if message_id not in raw_messages]
+        if missing:
+            downloaded = _download_raw_messages(self._retriever, missing)
+            self._cache.put(downloaded)
+            raw_messages.update(downloaded)
+        return raw_messages
+
+    def get_messages_for_date_range(self, search_query: str, after_date: Union[date, datetime],
+                                    before_date: Union[date, datetime],
+                                    local_time_zone: tzinfo = None) -> list[Message]:
+        message_ids = self._message_ids(search_query, after_date, before_date, local_time_zone)
+        return decode_messages(message_ids, self._raw_messages(message_ids))
+
+
+def decode_messages(message_ids: list[str], raw_messages: dict[str, str]) -> list[Message]:
+    import gmails.retriever
+
+    messages = [gmails.retriever.decode_message({'raw': raw_messages[message_id]})
+                for message_id in message_ids if message_id in raw_messages]
+    return [message for message in messages if message is not None]
@@ -0,0 +1,51 @@
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+
+from beancount.core.amount import Amount, A
+
+MONEY_CACHE_SIZE: int = 4096
+
+_NUMBER_START: str = "-+0123456789"
+
+_SYMBOL_RE = re.compile(r"([^-+0-9]+)?(.*)")
+
+
+def _is_number(number: str) -> bool:
+    digits = number[1:] if number[:1] in ("-", "+") else number
+    if digits.count(".") > 1:
+        return False
+    digits = digits.replace(".", "", 1)
+    return digits.isascii() and digits.isdigit()
+
+
+def tokenise_money(money_string: str) -> Optional[tuple[str, str]]:
+    """ Splits a money string such as "£4.99 GBP" or "-4.99 GBP" into its number and currency code """
+    start = 0
+    length = len(money_string)
+    while start < length and money_string[start] not in _NUMBER_START:
+        start += 1
+
+    space = money_string.find(" ", start)
+    if space < 0:
+        return None
+
+    number = money_string[start:space]
+    currency = money_string[space + 1:]
+    if not _is_number(number) or not (currency.isascii() and currency.isalpha() and currency.isupper()):
+        return None
+    return number, currency
+
+
+@lru_cache(maxsize=MONEY_CACHE_SIZE)
+def parse_money(money_string: str, negate: bool = False) -> Amount:
+    """ Parses the amount in a money string, raising ValueError if it has none """
+    tokens = tokenise_money(money_string)
+    if tokens is None:
+        amount = A(_SYMBOL_RE.match(money_string).group(2))
+    else:
+        amount = Amount(Decimal(tokens[0]), tokens[1])
+    if negate:
+        amount = -amount
+    return amount
@@ -1,10 +1,13 @@
 import re
 from datetime import datetime
-from typing import Any, Optional, Union
+from typing import Any, Union
 
 from beancount.core.data import Transaction, Posting
-from beancount.core.amount import add, Amount, A
-from beancount.core.number import ZERO
+from beancount.core.amount import add, Amount
+from beancount.core.number import ZERO, D
+
+from beancount_gmail.common.keywords import KeywordScanner
+from beancount_gmail.money import parse_money
 
 ZERO_GBP: Amount = Amount(ZERO, "GBP")
 
@@ -19,30 +22,28 @@ TOTAL: str = "Total"
 POSTAGE_AND_PACKAGING_RE = re.compile("Postage and packaging(?! .)")
 
 
-def field_value_or_none(field: Any) -> Optional[Any]:
-    return lambda t: field if field in t else None
+RECEIPT_FIELDS = KeywordScanner([DESCRIPTION, SUB_TOTAL, TOTAL])
 
 
-RECEIPT_DETAILS = [
-    (POSTAGE_AND_PACKAGING, lambda t: POSTAGE_AND_PACKAGING_RE.match(t)),
-    (DESCRIPTION, field_value_or_none(DESCRIPTION)),
-    (SUB_TOTAL, field_value_or_none(SUB_TOTAL)),
-    (TOTAL, field_value_or_none(TOTAL))
-]
+def money_string_to_amount(money_string: str, negate: bool) -> Amount:
+    return parse_money(money_string, negate)
 
 
-def money_string_to_amount(money_string: str, negate: bool) -> Amount:
-    amount = A(re.match(r"([^-+0-9]+)?(.*)", money_string).group(2))
-    if negate:
-        amount = -amount
-    return amount
+AmountRecord = tuple[str, str]
+
+ReceiptRecord = tuple[datetime, tuple[tuple[str, AmountRecord], ...], AmountRecord, AmountRecord, AmountRecord]
+
+
+def _amount_record(amount: Amount) -> AmountRecord:
+    return str(amount.number), amount.currency
+
+
+def _amount_from_record(record: AmountRecord) -> Amount:
+    return Amount(D(record[0]), record[1])
 
 
 def contain_interesting_receipt_fields(text: str) -> bool:
-    for detail in RECEIPT_DETAILS:
-        if detail[1](text) is not None:
-            return True
-    return False
+    return POSTAGE_AND_PACKAGING_RE.match(text) is not None or RECEIPT_FIELDS.contains_any(text)
 
 
 def _strip_newlines(description: str) -> str:
@@ -67,40 +68,58 @@ def _with_meta(amount: Amount, description: str) -> Posting:
     return posting
 
 
+def _append_postings(transaction: Transaction, receipt_details: list[tuple[str, Amount]],
+                     postage_and_packing: Amount, postage_account: str) -> None:
+    transaction.postings.extend([_with_meta(amount, description) for description, amount in receipt_details])
+    if postage_and_packing:
+        transaction.postings.append(_posting(postage_account, postage_and_packing))
+
+
 def _currencies_match(sub_total: Amount, receipt_details_total: Amount) -> bool:
     return sub_total.currency == receipt_details_total.currency
 
 
-def _sum_up_sub_total(receipt_details: list[tuple[str, str]], negate: bool) -> Amount:
+def _sum_up_amounts(amounts: list[Amount]) -> Amount:
     sub_total = ZERO_GBP
 
-    for description, amount in receipt_details:
-        receipt_detail_amount = money_string_to_amount(amount, negate)
-        if not _currencies_match(sub_total, receipt_detail_amount) \
+    for amount in amounts:
+        if not _currencies_match(sub_total, amount) \
                 and not sub_total:
-            sub_total = receipt_detail_amount
+            sub_total = amount
         else:
-            sub_total = add(sub_total, receipt_detail_amount)
+            sub_total = add(sub_total, amount)
 
     return sub_total
 
 
+def _sum_up_sub_total(receipt_details: list[tuple[str, str]], negate: bool) -> Amount:
+    return _sum_up_amounts([money_string_to_amount(amount, negate) for description, amount in receipt_details])
+
+
 def _sum_up_total_and_postage(totals: list[tuple[str, str]], negate: bool) -> tuple[Amount, Amount]:
     total = None
     postage_and_packing = None
 
     for description, amount_string in totals:
-        if description.startswith("From amount") or \
-                TOTAL in description or \
-                SUB_TOTAL in description:
-            total = money_string_to_amount(amount_string, negate)
-        if POSTAGE_AND_PACKAGING_RE.match(description):
-            postage_and_packing = money_string_to_amount(amount_string, negate)
+        is_total = description.startswith("From amount") or \
+            TOTAL in description or \
+            SUB_TOTAL in description
+        is_postage_and_packing = POSTAGE_AND_PACKAGING_RE.match(description) is not None
+        if not (is_total or is_postage_and_packing):
+            continue
+
+        amount = money_string_to_amount(amount_string, negate)
+        if is_total:
+            total = amount
+        if is_postage_and_packing:
+            postage_and_packing = amount
 
     return total, postage_and_packing
 
 
 class Receipt(object):
+    __slots__ = ("receipt_date", "receipt_details", "sub_total", "total", "postage_and_packing")
+
     def __init__(self, receipt_date: datetime,
                  receipt_details: list[tuple[str, str]], totals: list[tuple[str, str]] = None,
                  total: Union[str, Amount] = None, postage_and_packing: Union[str, Amount] = None,
@@ -108,13 +127,9 @@ class Receipt(object):
         self.total = None
         self.postage_and_packing = None
         self.receipt_date = receipt_date
-        self.receipt_details = list()
-
-        for description, amount in receipt_details:
-            receipt_detail_amount = money_string_to_amount(amount, negate)
-            self.receipt_details.append((description, receipt_detail_amount))
-
-        self.sub_total = _sum_up_sub_total(receipt_details, negate)
+        self.receipt_details = [(description, money_string_to_amount(amount, negate))
+                                for description, amount in receipt_details]
+        self.sub_total = _sum_up_amounts([amount for description, amount in self.receipt_details])
 
         if totals is not None:
             self.total, self.postage_and_packing = _sum_up_total_and_postage(totals, negate)
@@ -130,21 +145,43 @@ class Receipt(object):
         if self.postage_and_packing is None:
             self.postage_and_packing = Amount(ZERO, self.total.currency)
 
-    def _receipt_details_postings(self) -> list[Posting]:
-        return [_with_meta(amount, description) for description, amount in
-                self.receipt_details]
+    def append_postings(self, transaction: Transaction, postage_account: str) -> None:
+        _append_postings(transaction, self.receipt_details, self.postage_and_packing, postage_account)
+
+    def to_record(self) -> ReceiptRecord:
+        """ A compact form of the receipt made of plain tuples and strings, cheap to send between processes """
+        return (self.receipt_date,
+                tuple((description, _amount_record(amount)) for description, amount in self.receipt_details),
+                _amount_record(self.sub_total), _amount_record(self.total), _amount_record(self.postage_and_packing))
 
-    def _postage_and_packing_posting(self, postage_account: str) -> Posting:
-        return _posting(postage_account, self.postage_and_packing)
+    def __getstate__(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
 
-    def append_postings(self, transaction: Transaction, postage_account: str) -> None:
-        transaction.postings.extend(self._receipt_details_postings())
-        if self.postage_and_packing:
-            transaction.postings.append(self._postage_and_packing_posting(postage_account))
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """ Receipts cached before Receipt had slots were pickled with the same dictionary of attributes """
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __str__(self) -> str:
         return "Receipt with total {} and descriptions {}".format(self.total, self.receipt_details)
 
 
+def _receipt(receipt_date: datetime, receipt_details: list[tuple[str, Amount]], sub_total: Amount, total: Amount,
+             postage_and_packing: Amount) -> Receipt:
+    """ A receipt from amounts which have already been parsed and summed """
+    receipt = Receipt.__new__(Receipt)
+    receipt.__setstate__({"receipt_date": receipt_date, "receipt_details": receipt_details, "sub_total": sub_total,
+                          "total": total, "postage_and_packing": postage_and_packing})
+    return receipt
+
+
+def receipt_from_record(record: ReceiptRecord) -> Receipt:
+    receipt_date, receipt_details, sub_total, total, postage_and_packing = record
+    return _receipt(receipt_date,
+                    [(description, _amount_from_record(amount)) for description, amount in receipt_details],
+                    _amount_from_record(sub_total), _amount_from_record(total),
+                    _amount_from_record(postage_and_packing))
+
+
 class NoReceiptsFoundException(Exception):
     pass
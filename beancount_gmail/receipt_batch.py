@@ -0,0 +1,162 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+from beancount.core.amount import Amount
+from beancount.core.data import Transaction
+
+from beancount_gmail.receipt import Receipt, _append_postings, _receipt
+
+_NAIVE: int = -2 ** 63
+
+_MICROSECONDS_PER_SECOND: int = 1000000
+
+
+class _Currencies(object):
+    def __init__(self) -> None:
+        self._currencies: list[str] = []
+        self._codes: dict[str, int] = dict()
+
+    def code(self, currency: str) -> int:
+        code = self._codes.get(currency)
+        if code is None:
+            code = self._codes[currency] = len(self._currencies)
+            self._currencies.append(currency)
+        return code
+
+    def currency(self, code: int) -> str:
+        return self._currencies[code]
+
+
+class _AmountColumn(object):
+    """ Amounts as whole numbers of their smallest decimal place, with the number of places and a currency code """
+
+    def __init__(self, currencies: _Currencies) -> None:
+        self._currencies = currencies
+        self._units = array('q')
+        self._places = array('B')
+        self._codes = array('H')
+
+    def append(self, amount: Amount) -> None:
+        exponent = amount.number.as_tuple().exponent
+        if not isinstance(exponent, int):
+            raise ValueError("Cannot store {} in a receipt batch".format(amount))
+        places = max(-exponent, 0)
+        self._units.append(int(amount.number.scaleb(places)))
+        self._places.append(places)
+        self._codes.append(self._currencies.code(amount.currency))
+
+    def extend(self, column: '_AmountColumn') -> None:
+        codes = [self._currencies.code(currency) for currency in column._currencies._currencies]
+        self._units.extend(column._units)
+        self._places.extend(column._places)
+        if codes == list(range(len(codes))):
+            self._codes.extend(column._codes)
+        else:
+            self._codes.extend(array('H', [codes[code] for code in column._codes]))
+
+    def __getitem__(self, position: int) -> Amount:
+        return Amount(Decimal(self._units[position]).scaleb(-self._places[position]),
+                      self._currencies.currency(self._codes[position]))
+
+
+class ReceiptBatch(object):
+    """ Receipts stored column by column in arrays rather than as objects, for backfills holding many at once """
+
+    def __init__(self, receipts: Iterable[Receipt] = ()) -> None:
+        self._currencies = _Currencies()
+        self._time_zones: dict[int, Optional[timezone]] = {_NAIVE: None}
+
+        self._ordinals = array('l')
+        self._times = array('q')
+        self._utc_offsets = array('q')
+        self._totals = _AmountColumn(self._currencies)
+        self._sub_totals = _AmountColumn(self._currencies)
+        self._postage_and_packing = _AmountColumn(self._currencies)
+
+        self._detail_starts = array('q', [0])
+        self._detail_amounts = _AmountColumn(self._currencies)
+        self._description_starts = array('q', [0])
+        self._descriptions = bytearray()
+
+        self.extend(receipts)
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def append(self, receipt: Receipt) -> None:
+        receipt_date = receipt.receipt_date
+        utc_offset = receipt_date.utcoffset()
+        self._ordinals.append(receipt_date.toordinal())
+        self._times.append(((receipt_date.hour * 60 + receipt_date.minute) * 60 + receipt_date.second)
+                           * _MICROSECONDS_PER_SECOND + receipt_date.microsecond)
+        self._utc_offsets.append(_NAIVE if utc_offset is None else utc_offset // timedelta(microseconds=1))
+        self._totals.append(receipt.total)
+        self._sub_totals.append(receipt.sub_total)
+        self._postage_and_packing.append(receipt.postage_and_packing)
+
+        for description, amount in receipt.receipt_details:
+            self._detail_amounts.append(amount)
+            self._descriptions.extend(description.encode())
+            self._description_starts.append(len(self._descriptions))
+        self._detail_starts.append(len(self._description_starts) - 1)
+
+    def extend(self, receipts: Iterable[Receipt]) -> None:
+        if isinstance(receipts, ReceiptBatch):
+            self._extend_batch(receipts)
+        else:
+            for receipt in receipts:
+                self.append(receipt)
+
+    def _extend_batch(self, batch: 'ReceiptBatch') -> None:
+        detail_starts = [start + self._detail_starts[-1] for start in batch._detail_starts[1:]]
+        description_starts = [start + self._description_starts[-1] for start in batch._description_starts[1:]]
+
+        self._ordinals.extend(batch._ordinals)
+        self._times.extend(batch._times)
+        self._utc_offsets.extend(batch._utc_offsets)
+        self._totals.extend(batch._totals)
+        self._sub_totals.extend(batch._sub_totals)
+        self._postage_and_packing.extend(batch._postage_and_packing)
+
+        self._detail_starts.extend(array('q', detail_starts))
+        self._detail_amounts.extend(batch._detail_amounts)
+        self._description_starts.extend(array('q', description_starts))
+        self._descriptions.extend(batch._descriptions)
+
+    def date_ordinal(self, position: int) -> int:
+        """ The ordinal of the date the receipt was sent on, in the time zone it was sent from """
+        return self._ordinals[position]
+
+    def receipt_date(self, position: int) -> datetime:
+        utc_offset = self._utc_offsets[position]
+        if utc_offset not in self._time_zones:
+            self._time_zones[utc_offset] = timezone(timedelta(microseconds=utc_offset))
+        return datetime.fromordinal(self._ordinals[position]).replace(tzinfo=self._time_zones[utc_offset]) \
+            + timedelta(microseconds=self._times[position])
+
+    def total(self, position: int) -> Amount:
+        return self._totals[position]
+
+    def postage_and_packing(self, position: int) -> Amount:
+        return self._postage_and_packing[position]
+
+    def receipt_details(self, position: int) -> list[tuple[str, Amount]]:
+        return [(self._descriptions[self._description_starts[detail]:
+                                    self._description_starts[detail + 1]].decode(), self._detail_amounts[detail])
+                for detail in range(self._detail_starts[position], self._detail_starts[position + 1])]
+
+    def append_postings(self, position: int, transaction: Transaction, postage_account: str) -> None:
+        """ Adds the postings for the receipt at position, as Receipt.append_postings would """
+        _append_postings(transaction, self.receipt_details(position), self.postage_and_packing(position),
+                         postage_account)
+
+    def __getitem__(self, position: int) -> Receipt:
+        if not 0 <= position < len(self):
+            raise IndexError("Receipt batch position out of range")
+        return _receipt(self.receipt_date(position), self.receipt_details(position), self._sub_totals[position],
+                        self.total(position), self.postage_and_packing(position))
+
+    def __iter__(self) -> Iterator[Receipt]:
+        return (self[position] for position in range(len(self)))
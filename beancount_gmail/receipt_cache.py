@@ -0,0 +1,70 @@
+import hashlib
+import pickle
+import zlib
+from mailbox import Message
+from typing import Optional
+
+from beancount_gmail.common.sqlite_store import SqliteStore
+from beancount_gmail.email_parser_protocol import EmailParser, DEFAULT_TREE_BUILDER, parser_name
+from beancount_gmail.email_processing import try_extract_receipts, tree_builder_for
+from beancount_gmail.receipt import Receipt
+
+RECEIPT_CACHE_FILE: str = "receipts.sqlite"
+
+
+def message_key(message: Message) -> str:
+    message_id = message.get("Message-ID")
+    if message_id:
+        return message_id.strip()
+    return hashlib.sha1(message.as_bytes()).hexdigest()
+
+
+def parser_version(parser: EmailParser, default_tree_builder: str = DEFAULT_TREE_BUILDER) -> str:
+    """ The parser's version together with the tree builder, since a different tree could give different receipts """
+    return "{} {}".format(parser.version(), tree_builder_for(parser, default_tree_builder))
+
+
+class ReceiptCache(SqliteStore):
+    """ Receipts already extracted from a message, keyed by message and the name and version of the parser """
+
+    def __init__(self, directory: str) -> None:
+        super().__init__(directory, RECEIPT_CACHE_FILE,
+                         ["receipts (parser TEXT NOT NULL, version TEXT NOT NULL, message TEXT NOT NULL, "
+                          "data BLOB NOT NULL, PRIMARY KEY (parser, version, message))"])
+        self._current_versions: dict[str, str] = dict()
+
+    def _discard_other_versions(self, parser: EmailParser, tree_builder: str) -> tuple[str, str]:
+        name, version = parser_name(parser), parser_version(parser, tree_builder)
+        if self._current_versions.get(name) != version:
+            with self._connection:
+                self._connection.execute("DELETE FROM receipts WHERE parser = ? AND version != ?", (name, version))
+            self._current_versions[name] = version
+        return name, version
+
+    def get(self, parser: EmailParser, message: Message,
+            tree_builder: str = DEFAULT_TREE_BUILDER) -> Optional[list[Receipt]]:
+        with self._lock:
+            name, version = self._discard_other_versions(parser, tree_builder)
+            row = self._connection.execute("SELECT data FROM receipts WHERE parser = ? AND version = ? AND message = ?",
+                                           (name, version, message_key(message))).fetchone()
+        return None if row is None else pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, parser: EmailParser, message: Message, receipts: list[Receipt],
+            tree_builder: str = DEFAULT_TREE_BUILDER) -> None:
+        data = zlib.compress(pickle.dumps(receipts))
+        with self._lock:
+            name, version = self._discard_other_versions(parser, tree_builder)
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO receipts (parser, version, message, data) "
+                                         "VALUES (?, ?, ?, ?)", (name, version, message_key(message), data))
+
+    def extract_receipts(self, parser: EmailParser, message: Message,
+                         tree_builder: str = DEFAULT_TREE_BUILDER) -> list[Receipt]:
+        """ Returns the cached receipts for the message, or extracts them and caches them if the email parsed """
+        receipts = self.get(parser, message, tree_builder)
+        if receipts is None:
+            receipts = try_extract_receipts(parser, message, tree_builder)
+            if receipts is None:
+                return []
+            self.put(parser, message, receipts, tree_builder)
+        return receipts
@@ -0,0 +1,90 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta, date
+from typing import Union
+
+from beancount.core.amount import Amount
+from beancount.core.data import Transaction
+
+from beancount_gmail.receipt import Receipt
+from beancount_gmail.receipt_batch import ReceiptBatch
+
+
+def search_window_days(search_delta: timedelta) -> int:
+    return max(search_delta.days, 0)
+
+
+def within_search_window(transaction_date: date, receipt_date: date, search_delta: timedelta = timedelta()) -> bool:
+    return abs(transaction_date.toordinal() - receipt_date.toordinal()) <= search_window_days(search_delta)
+
+
+class DateWindowIndex(object):
+    """ Sorted receipt dates which can be searched for every entry within a window around a date """
+
+    def __init__(self, entries: list[tuple[date, int]]) -> None:
+        self._entries: list[tuple[int, int]] = sorted((receipt_date.toordinal(), position)
+                                                      for receipt_date, position in entries)
+
+    @classmethod
+    def from_ordinals(cls, entries: list[tuple[int, int]]) -> "DateWindowIndex":
+        index = cls([])
+        index._entries = sorted(entries)
+        return index
+
+    def pop_window(self, centre: date, days: int) -> list[int]:
+        """ Removes and returns the positions of every entry within days either side of centre """
+        ordinal = centre.toordinal()
+        start = bisect_left(self._entries, (ordinal - days,))
+        end = bisect_right(self._entries, (ordinal + days + 1,))
+        positions = [position for _, position in self._entries[start:end]]
+        del self._entries[start:end]
+        return positions
+
+
+class ReceiptMatcher(object):
+    """ Indexes receipts by negated total and date so that transactions can be matched without a full scan """
+
+    def __init__(self, receipts: Union[list[Receipt], ReceiptBatch], search_delta: timedelta = timedelta()) -> None:
+        self._days = search_window_days(search_delta)
+        self._receipts: Union[list[Receipt], ReceiptBatch] = receipts if isinstance(receipts, ReceiptBatch) \
+            else list(receipts)
+        self._matched: set[int] = set()
+
+        entries_by_amount: dict[Amount, list[tuple[int, int]]] = dict()
+        if isinstance(self._receipts, ReceiptBatch):
+            for position in range(len(self._receipts)):
+                entries_by_amount.setdefault(-self._receipts.total(position), []).append(
+                    (self._receipts.date_ordinal(position), position))
+        else:
+            for position, receipt in enumerate(self._receipts):
+                entries_by_amount.setdefault(-receipt.total, []).append(
+                    (receipt.receipt_date.date().toordinal(), position))
+
+        self._index: dict[Amount, DateWindowIndex] = {amount: DateWindowIndex.from_ordinals(entries)
+                                                      for amount, entries in entries_by_amount.items()}
+
+    def match_positions(self, transaction: Transaction) -> list[int]:
+        """ Removes and returns the positions of every remaining receipt matching the transaction, in order """
+        if not isinstance(transaction, Transaction) or not transaction.postings:
+            return []
+
+        units = transaction.postings[0].units
+        if not isinstance(units, Amount) or units not in self._index:
+            return []
+
+        positions = sorted(self._index[units].pop_window(transaction.date, self._days))
+        self._matched.update(positions)
+        return positions
+
+    def match(self, transaction: Transaction) -> list[Receipt]:
+        """ Removes and returns every remaining receipt matching the transaction, in their original order """
+        return [self._receipts[position] for position in self.match_positions(transaction)]
+
+    def append_postings(self, position: int, transaction: Transaction, postage_account: str) -> None:
+        if isinstance(self._receipts, ReceiptBatch):
+            self._receipts.append_postings(position, transaction, postage_account)
+        else:
+            self._receipts[position].append_postings(transaction, postage_account)
+
+    def unmatched(self) -> list[Receipt]:
+        return [self._receipts[position] for position in range(len(self._receipts))
+                if position not in self._matched]
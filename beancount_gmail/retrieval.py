@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+from datetime import date, datetime
+from mailbox import Message
+from typing import Callable, Optional, Union, Protocol, TYPE_CHECKING
+
+from beancount_gmail.message_cache import DEFAULT_MESSAGE_CACHE_SIZE, check_message_cache_options
+
+if TYPE_CHECKING:
+    import gmails.retriever
+    from pytz import tzinfo
+
+APPLICATION_NAME: str = 'beancount-import-gmail'
+
+
+class MessageRetriever(Protocol):
+    """ Anything which can find the messages for a search query, such as the gmails Retriever """
+
+    def get_messages_for_date_range(self, search_query: str, after_date: Union[date, datetime],
+                                    before_date: Union[date, datetime],
+                                    local_time_zone: tzinfo = None) -> list[Message]:
+        """ Returns the messages matching search_query received on or after after_date and before before_date """
+
+
+def create_retriever(email_address: str, secrets_directory: str,
+                     message_cache_directory: Optional[str] = None,
+                     message_cache_size: int = DEFAULT_MESSAGE_CACHE_SIZE,
+                     incremental_sync: bool = False) -> MessageRetriever:
+    import gmails.retriever
+    from beancount_gmail.incremental_sync import SyncingRetriever, SyncState
+    from beancount_gmail.message_cache import CachingRetriever, MessageCache
+
+    check_message_cache_options(message_cache_directory, incremental_sync)
+    retriever = ThreadLocalRetriever(lambda: gmails.retriever.Retriever(APPLICATION_NAME, email_address,
+                                                                        secrets_directory))
+    if message_cache_directory is None:
+        return retriever
+
+    cache = MessageCache(message_cache_directory, message_cache_size)
+    if incremental_sync:
+        return SyncingRetriever(retriever, cache, SyncState(message_cache_directory), email_address)
+    return CachingRetriever(retriever, cache)
+
+
+class ThreadLocalRetriever(object):
+    """ Gives each thread its own gmails Retriever and Gmail connection, all sharing one set of credentials """
+
+    thread_safe: bool = True
+
+    def __init__(self, create_retriever: Callable[[], gmails.retriever.Retriever]) -> None:
+        self._create_retriever = create_retriever
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_credentials(self, retriever: gmails.retriever.Retriever):
+        with self._credentials_lock:
+            if self._credentials is None:
+                self._credentials = retriever._get_credentials()
+            return self._credentials
+
+    def _retriever(self) -> gmails.retriever.Retriever:
+        retriever = getattr(self._local, 'retriever', None)
+        if retriever is None:
+            retriever = self._create_retriever()
+            retriever._current_service = retriever._build_service(self._get_credentials(retriever))
+            self._local.retriever = retriever
+        return retriever
+
+    @property
+    def _email_address(self) -> str:
+        return self._retriever()._email_address
+
+    def _get_service(self):
+        return self._retriever()._get_service()
+
+    def _list_messages_for_days(self, *args, **kwargs):
+        return self._retriever()._list_messages_for_days(*args, **kwargs)
+
+    def get_messages_for_date_range(self, *args, **kwargs) -> list[Message]:
+        return self._retriever().get_messages_for_date_range(*args, **kwargs)
+
+
+def is_thread_safe(retriever: MessageRetriever) -> bool:
+    """ Whether threads can share the retriever, which they can if it says so with a true thread_safe attribute """
+    return getattr(retriever, 'thread_safe', False)
+
+
+def shared_retriever(retriever: MessageRetriever) -> MessageRetriever:
+    """ Returns the retriever for threads to share, serialised unless it is thread safe """
+    return retriever if is_thread_safe(retriever) else SerialisedRetriever(retriever)
+
+
+class SerialisedRetriever(object):
+    """ Lets threads share a retriever which is not thread safe, one date range at a time """
+
+    def __init__(self, retriever: MessageRetriever) -> None:
+        self._retriever = retriever
+        self._lock = threading.Lock()
+
+    def get_messages_for_date_range(self, *args, **kwargs) -> list[Message]:
+        with self._lock:
+            return list(self._retriever.get_messages_for_date_range(*args, **kwargs))
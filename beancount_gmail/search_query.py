@@ -0,0 +1,109 @@
+import re
+from email.header import decode_header, make_header
+from email.utils import parseaddr
+from mailbox import Message
+from typing import Optional
+
+_TERM_RE = re.compile(r"""(?P<negate>-)?(?:(?P<operator>[a-z]+):)?(?:"(?P<double>[^"]*)"|'(?P<single>[^']*)'|(?P<word>\S+))""")
+
+_ADDRESS_RE = re.compile(r"[^@\s]+@[^@\s]+")
+
+_HEADERS_FOR_OPERATOR: dict[str, tuple[str, ...]] = {
+    "from": ("From",),
+    "to": ("To",),
+    "subject": ("Subject",),
+}
+
+
+def header_text(message: Message, header: str) -> str:
+    value = message.get(header)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except (UnicodeError, LookupError, ValueError):
+        return str(value)
+
+
+class SearchTerm(object):
+    def __init__(self, operator: Optional[str], value: str, negate: bool) -> None:
+        self.operator = operator
+        self.value = value.lower()
+        self.negate = negate
+
+    def matches(self, message: Message, text: Optional[str] = None) -> bool:
+        if self.operator is None and text is not None:
+            return (self.value in text) != self.negate
+
+        headers = _HEADERS_FOR_OPERATOR.get(self.operator)
+        if headers is None:
+            return True
+
+        found = any(self.value in header_text(message, header).lower() for header in headers)
+        return found != self.negate
+
+
+class SearchQuery(object):
+    """ Evaluates the from:, to: and subject: terms of a Gmail search query against the headers of a message """
+
+    def __init__(self, query: str) -> None:
+        self.query = query
+        self.terms = [SearchTerm(match.group('operator'),
+                                 next(group for group in match.group('double', 'single', 'word') if group is not None),
+                                 match.group('negate') is not None)
+                      for match in _TERM_RE.finditer(query.replace("\\'", "'").replace('\\"', '"'))]
+        self._supported = not any(term.operator is None and (term.value == 'or' or term.value[:1] in ('(', '{'))
+                                  for term in self.terms)
+
+    def answerable(self) -> bool:
+        """ Whether matches gives the same answer as Gmail would """
+        return self._supported and all(term.operator in _HEADERS_FOR_OPERATOR for term in self.terms)
+
+    def senders(self) -> list[str]:
+        return [term.value for term in self.terms if term.operator == 'from' and not term.negate]
+
+    def matches(self, message: Message, text: Optional[str] = None) -> bool:
+        return not self._supported or all(term.matches(message, text) for term in self.terms)
+
+
+def message_text(message: Message) -> str:
+    """ The lower cased From, To and Subject headers and text parts of the message """
+    text = [header_text(message, header) for header in ("From", "To", "Subject")]
+    for part in message.walk():
+        if part.get_content_maintype() == "text":
+            payload = part.get_payload(decode=True)
+            if payload is not None:
+                text.append(payload.decode(part.get_content_charset() or "utf-8", errors="replace"))
+    return "\n".join(text).lower()
+
+
+def combine_search_queries(queries: list[str]) -> str:
+    if len(queries) == 1:
+        return queries[0]
+    return " OR ".join("({})".format(query) for query in queries)
+
+
+def sender_address(message: Message) -> str:
+    return parseaddr(header_text(message, "From"))[1].lower()
+
+
+class MessageDispatcher(object):
+    """ Finds which of several search queries a message retrieved by their combined query belongs to """
+
+    def __init__(self, queries: list[str]) -> None:
+        self._queries = [SearchQuery(query) for query in queries]
+        self._by_sender: dict[str, list[int]] = dict()
+        self._unindexed: list[int] = []
+
+        for position, query in enumerate(self._queries):
+            senders = [sender for sender in query.senders() if _ADDRESS_RE.fullmatch(sender)]
+            if senders:
+                for sender in senders:
+                    self._by_sender.setdefault(sender, []).append(position)
+            else:
+                self._unindexed.append(position)
+
+    def dispatch(self, message: Message) -> list[int]:
+        """ Returns, in order, the positions of the queries matching the message """
+        candidates = sorted(set(self._by_sender.get(sender_address(message), []) + self._unindexed))
+        return [position for position in candidates if self._queries[position].matches(message)]
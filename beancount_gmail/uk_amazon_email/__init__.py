@@ -1,15 +1,23 @@
-from datetime import datetime
+from __future__ import annotations
 
-from bs4 import BeautifulSoup
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
 
 from beancount_gmail.email_parser_protocol import EmailParser
 from beancount_gmail.receipt import Receipt
-from beancount_gmail.uk_amazon_email.parsing import extract_receipts
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 
 class UKAmazonParser(EmailParser):
     def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        from beancount_gmail.uk_amazon_email.parsing import extract_receipts
+
         return extract_receipts(message_date, soup)
 
     def search_query(self) -> str:
         return r'\'Your Amazon.co.uk order confirmation\' auto-confirm@amazon.co.uk'
+
+    def tree_builder(self) -> Optional[str]:
+        return super().tree_builder() or "lxml"
@@ -5,31 +5,26 @@ from typing import Optional
 
 import bs4
 
-from beancount_gmail.common.parsing import extract_row_text
+from beancount_gmail.common.keywords import KeywordScanner
+from beancount_gmail.common.parsing import iter_row_text
 from beancount_gmail.receipt import Receipt, NoReceiptsFoundException
 
 
-def index_containing(table_text, needle):
-    for i, row in enumerate(table_text):
-        if needle in row:
-            return i
-    return -1
+PRODUCT_SUGGESTIONS: str = 'We hope to see you again soon.Amazon.co.uk'
 
+ORDER_TOTAL: str = 'Order Total:'
 
-def truncate_end_with_product_suggestions(table_text: list[list[str]]) -> list[list[str]]:
-    end = index_containing(table_text, 'We hope to see you again soon.Amazon.co.uk')
-    return table_text[0:end] if end > 0 else table_text
+POSTAGE_AND_PACKING: str = 'Postage & Packing:'
+
+ROW_LABELS = KeywordScanner([ORDER_TOTAL, POSTAGE_AND_PACKING])
 
 
 def extract_receipts(message_date: datetime, beautiful_soup: bs4.BeautifulSoup) -> list[Receipt]:
     receipts = list()
 
-    table_text = [extract_row_text(row) for row in beautiful_soup.find_all('tr')]
-
-    order_only = truncate_end_with_product_suggestions(table_text)
-
-    interesting = [row for row in order_only if len([entry for entry in row if '£' in entry]) > 0]
-    expected_receipts = len([cell for cell in interesting if 'Order Total:' in cell])
+    interesting = list(iter_row_text(beautiful_soup, stop_at=PRODUCT_SUGGESTIONS, containing='£'))
+    labels = [ROW_LABELS.whole_cells(row) for row in interesting]
+    expected_receipts = len([row_labels for row_labels in labels if ORDER_TOTAL in row_labels])
 
     class PotentialReceipt(object):
         def __init__(self) -> None:
@@ -69,12 +64,12 @@ def extract_receipts(message_date: datetime, beautiful_soup: bs4.BeautifulSoup)
 
     potential_receipt = PotentialReceipt()
     potential_receipts = {potential_receipt}
-    for row in interesting:
+    for row, row_labels in zip(interesting, labels):
         if len(row) > 2:
             potential_receipt = potential_receipt.add_description(row)
-        elif 'Order Total:' in row:
+        elif ORDER_TOTAL in row_labels:
             potential_receipt = potential_receipt.add_total(row[1])
-        elif 'Postage & Packing:' in row:
+        elif POSTAGE_AND_PACKING in row_labels:
             potential_receipt = potential_receipt.add_postage(row[1])
 
         potential_receipts.add(potential_receipt)
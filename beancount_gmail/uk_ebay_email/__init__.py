@@ -1,15 +1,28 @@
-from datetime import datetime
+from __future__ import annotations
 
-from bs4 import BeautifulSoup
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
 
 from beancount_gmail.email_parser_protocol import EmailParser
 from beancount_gmail.receipt import Receipt
-from beancount_gmail.uk_ebay_email.parsing import extract_receipts
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer
 
 
 class UKeBayParser(EmailParser):
     def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        from beancount_gmail.uk_ebay_email.parsing import extract_receipts
+
         return extract_receipts(message_date, soup)
 
     def search_query(self) -> str:
         return 'from:ebay@ebay.com'
+
+    def tree_builder(self) -> Optional[str]:
+        return super().tree_builder() or "lxml"
+
+    def parse_only(self) -> Optional[SoupStrainer]:
+        from beancount_gmail.common.parsing import TABLES_AND_TITLE
+
+        return TABLES_AND_TITLE
@@ -2,15 +2,12 @@ from datetime import datetime
 from typing import Optional
 
 from bs4 import BeautifulSoup
-from bs4.element import Comment, Tag
 
-from beancount_gmail.common.parsing import extract_row_text
+from beancount_gmail.common.keywords import KeywordScanner
+from beancount_gmail.common.parsing import extract_row_text, leaf_tables
 from beancount_gmail.receipt import Receipt, _sum_up_sub_total
 
-
-def remove_comments(tag: Tag) -> None:
-    for c in tag.find_all(text=lambda t: isinstance(t, Comment)):
-        c.extract()
+INTERESTING_ROW_KEYWORDS = KeywordScanner(["Order", "Your seller"])
 
 
 def description_details(details: list[str]) -> tuple[str, Optional[str]]:
@@ -34,9 +31,8 @@ def first_price(rows: list[str]) -> Optional[str]:
 
 
 def extract_receipts(message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
-    remove_comments(soup)
-    table_text = [replace_with_currency_code(extract_row_text(table)) for table in soup.find_all('table')
-                  if table.find('table') is None]
+    table_text = [replace_with_currency_code(extract_row_text(table))
+                  for table in leaf_tables(soup, strip_comments=True)]
     descriptions, totals = description_and_total_details(list(filter(interesting_row, table_text)))
 
     receipts = list()
@@ -69,5 +65,5 @@ def replace_with_currency_code(rows: list[str]) -> list[str]:
 
 def interesting_row(rows: list[str]) -> bool:
     if len(rows) > 1:
-        return any(("Order" in s) or ("Your seller" in s) for s in rows)
+        return INTERESTING_ROW_KEYWORDS.any_cell_contains_any(rows)
     return False
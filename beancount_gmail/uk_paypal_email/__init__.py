@@ -1,37 +1,50 @@
-import re
-from datetime import datetime
+from __future__ import annotations
 
-from bs4 import BeautifulSoup
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
 
 from beancount_gmail import receipt as receipt
 from beancount_gmail.email_parser_protocol import EmailParser
 from beancount_gmail.receipt import Receipt
-from beancount_gmail.uk_paypal_email.parsing import extract_receipt_details_from_donation, \
-    extract_receipt_data_from_tables
+from beancount_gmail.uk_paypal_email.common_re import DONATION_TITLE_RE, REFUND_RE, RECEIVED_PAYMENT_RE
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer
 
 
 class PayPalUKParser(EmailParser):
     def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
-        if soup.title is not None and \
-                soup.title.find(text=re.compile(r"Receipt for your donation", re.UNICODE)) is not None:
+        from beancount_gmail.common.text_index import TextIndex
+        from beancount_gmail.uk_paypal_email.parsing import extract_receipt_details_from_donation, \
+            extract_receipt_data_from_tables
+
+        text_index = TextIndex(soup)
+        if soup.title is not None and text_index.search(DONATION_TITLE_RE, soup.title) is not None:
             receipt_data = extract_receipt_details_from_donation(soup)
         else:
             receipt_data = extract_receipt_data_from_tables(soup)
 
+        if len(receipt_data) == 0:
+            raise receipt.NoReceiptsFoundException("Did not find any receipts")
+
+        negate = text_index.search(REFUND_RE) is not None or text_index.search(RECEIVED_PAYMENT_RE) is not None
+
         receipts = []
         while len(receipt_data) > 0:
             receipt_details = [(detail[0], detail[3]) for detail in receipt_data.pop(0)[1:]]
             total_details = [(detail[0], detail[1]) for detail in receipt_data.pop(0) if len(detail) == 2]
 
-            negate = soup.find(text=re.compile(".*refund .*", re.IGNORECASE)) is not None or \
-                soup.find(text=re.compile(".*You received a payment.*", re.IGNORECASE)) is not None
-
             receipts.append(receipt.Receipt(message_date, receipt_details, total_details, negate=negate))
 
-        if len(receipts) == 0:
-            raise receipt.NoReceiptsFoundException("Did not find any receipts")
-
         return receipts
 
     def search_query(self):
         return 'from:service@paypal.co.uk'
+
+    def tree_builder(self) -> Optional[str]:
+        return super().tree_builder() or "lxml"
+
+    def parse_only(self) -> Optional[SoupStrainer]:
+        from beancount_gmail.common.parsing import TABLES_AND_TITLE
+
+        return TABLES_AND_TITLE
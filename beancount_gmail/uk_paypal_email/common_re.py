@@ -1,8 +1,15 @@
 import re
+from typing import Pattern
 
-DONATION_DETAILS_RE: str = re.compile(r"Donation amount:(?P<Donation>£\d+\.\d\d [A-Z]{3}) +"
+DONATION_DETAILS_RE: Pattern = re.compile(r"Donation amount:(?P<Donation>£\d+\.\d\d [A-Z]{3}) +"
                                       r"Total:(?P<Total>£\d+\.\d\d [A-Z]{3}) +"
                                       r"Purpose:(?P<Purpose>[ \S]+\S) +"
                                       r"Contributor:")
 
 UUID_PATTERN: str = r"[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12}"
+
+DONATION_TITLE_RE: Pattern = re.compile(r"Receipt for your donation", re.UNICODE)
+
+REFUND_RE: Pattern = re.compile(r"refund ", re.IGNORECASE)
+
+RECEIVED_PAYMENT_RE: Pattern = re.compile(r"You received a payment", re.IGNORECASE)
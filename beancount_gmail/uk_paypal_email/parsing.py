@@ -3,7 +3,7 @@ import re
 from bs4.element import Tag
 
 import beancount_gmail.receipt as receipt
-from beancount_gmail.common.parsing import extract_row_text
+from beancount_gmail.common.parsing import extract_row_text, leaf_tables
 from beancount_gmail.uk_paypal_email.common_re import DONATION_DETAILS_RE, UUID_PATTERN
 
 
@@ -41,9 +41,7 @@ def post_process_for_alternate_format(receipt_table_data: list[list[str]]) -> li
 
 def extract_receipt_data_from_tables(soup: Tag) -> list[list[list[str]]]:
     receipt_data = []
-    for table in soup.find_all("table"):
-        if table.find("table") is not None:
-            continue
+    for table in leaf_tables(soup):
         if contains_interesting_table(table):
             receipt_table_data = []
             for row in table.find_all("tr"):
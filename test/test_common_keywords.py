@@ -0,0 +1,48 @@
+import pytest
+from hamcrest import assert_that, is_
+
+from beancount_gmail.common.keywords import KeywordScanner
+from beancount_gmail.receipt import contain_interesting_receipt_fields
+
+
+def test_contains_any_finds_a_keyword_anywhere_in_the_text():
+    scanner = KeywordScanner(["Order", "Order Total:", "Your seller"])
+
+    assert_that(scanner.contains_any("Order Total: £4.99"), is_(True))
+    assert_that(scanner.contains_any("Your seller: someone"), is_(True))
+    assert_that(scanner.contains_any("Nothing here"), is_(False))
+
+
+def test_cells_are_scanned_without_matching_across_them():
+    scanner = KeywordScanner(["Your seller"])
+
+    assert_that(scanner.any_cell_contains_any(["Item", "Your seller is"]), is_(True))
+    assert_that(scanner.any_cell_contains_any(["Your", "seller"]), is_(False))
+
+
+def test_whole_cells_only_match_exactly():
+    scanner = KeywordScanner(["Order Total:"])
+
+    assert_that(scanner.whole_cells(["Order Total:", "£4.99"]), is_({"Order Total:"}))
+    assert_that(scanner.whole_cells(["Order Total: £4.99"]), is_(set()))
+
+
+def test_register_adds_keyword_sets():
+    scanner = KeywordScanner(["Total"])
+    scanner.register(["Subtotal", "Total"])
+
+    assert_that(scanner.keywords, is_(("Total", "Subtotal")))
+    with pytest.raises(ValueError):
+        scanner.register(["Order\x00Total"])
+
+
+@pytest.mark.parametrize("text,interesting", [
+    ("Postage and packaging", True),
+    ("Postage and packaging costs", False),
+    ("Item Description", True),
+    ("Subtotal", True),
+    ("Order Total", True),
+    ("Thanks for your order", False),
+])
+def test_interesting_receipt_fields(text, interesting):
+    assert_that(contain_interesting_receipt_fields(text), is_(interesting))
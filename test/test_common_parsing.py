@@ -0,0 +1,45 @@
+from bs4 import BeautifulSoup
+from hamcrest import assert_that, is_
+
+from beancount_gmail.common.parsing import extract_row_text, leaf_tables, iter_row_text
+
+NESTED_TABLE_ROW = ('<table><tr>'
+                    '<td>Item <a href="#">Widget<table><tr><td>hidden</td></tr></table></a></td>'
+                    '<td>Price<table><tr><td>nested</td><th>cell</th></tr></table> £1.00</td>'
+                    '</tr></table>')
+
+
+def test_nested_tables_are_left_out_of_row_text_without_changing_the_row():
+    soup = BeautifulSoup(NESTED_TABLE_ROW, "html.parser")
+    row = soup.find('tr')
+
+    assert_that(extract_row_text(row), is_(['ItemWidget', '', 'Price£1.00', '', '']))
+    assert_that(str(soup), is_(NESTED_TABLE_ROW))
+
+
+def test_leaf_tables_are_found_in_document_order_and_comments_stripped():
+    soup = BeautifulSoup('<table id="outer"><tr><td><table id="a"><tr><td>A<!-- note --></td></tr></table>'
+                         '<table id="middle"><tr><td><table id="b"></table></td></tr></table></td></tr></table>'
+                         '<div><table id="c"></table></div>', "html.parser")
+
+    tables = leaf_tables(soup, strip_comments=True)
+
+    assert_that([table['id'] for table in tables], is_(['a', 'b', 'c']))
+    assert_that(extract_row_text(tables[0]), is_(['A']))
+
+
+def test_row_text_is_yielded_in_document_order_until_sentinel():
+    soup = BeautifulSoup('<table><tr><td>First</td></tr>'
+                         '<tr><td>Item</td><td>£1<table><tr><td>Nested £2</td></tr></table></td></tr>'
+                         '<tr><td>No price</td></tr><tr><td>Stop</td></tr><tr><td>£3</td></tr></table>',
+                         "html.parser")
+
+    assert_that(list(iter_row_text(soup, containing='£')), is_([['Item', '£1', ''], ['Nested £2'], ['£3']]))
+    assert_that(list(iter_row_text(soup, stop_at='Stop', containing='£')), is_([['Item', '£1', ''], ['Nested £2']]))
+
+
+def test_sentinel_in_the_first_row_stops_nothing():
+    soup = BeautifulSoup('<table><tr><td>Stop</td></tr><tr><td>£1</td></tr>'
+                         '<tr><td>Stop</td></tr><tr><td>£2</td></tr></table>', "html.parser")
+
+    assert_that(list(iter_row_text(soup, stop_at='Stop')), is_([['Stop'], ['£1'], ['Stop'], ['£2']]))
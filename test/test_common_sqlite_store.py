@@ -0,0 +1,15 @@
+from hamcrest import assert_that, is_
+
+from beancount_gmail.common.sqlite_store import SqliteStore
+
+
+def test_store_creates_its_directory_and_tables_once(tmp_path):
+    directory = str(tmp_path / 'nested' / 'cache')
+    store = SqliteStore(directory, 'test.sqlite', ["first (id TEXT PRIMARY KEY)", "second (id TEXT PRIMARY KEY)"])
+    with store._connection:
+        store._connection.execute("INSERT INTO first (id) VALUES ('kept')")
+    store.close()
+
+    reopened = SqliteStore(directory, 'test.sqlite', ["first (id TEXT PRIMARY KEY)", "second (id TEXT PRIMARY KEY)"])
+    assert_that(reopened._connection.execute("SELECT id FROM first").fetchall(), is_([('kept',)]))
+    assert_that(reopened._connection.execute("SELECT COUNT(*) FROM second").fetchone()[0], is_(0))
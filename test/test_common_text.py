@@ -0,0 +1,16 @@
+from hamcrest import assert_that, is_
+
+from beancount_gmail.common.text import text_lines, match_lines
+
+SUBSCRIPTION_EMAIL = """Thanks for your subscription.
+
+  Plan:\tPremium  Monthly
+Total:\xa0£9.99
+"""
+
+
+def test_lines_are_normalised_and_matched():
+    lines = text_lines(SUBSCRIPTION_EMAIL)
+
+    assert_that(lines, is_(['Thanks for your subscription.', 'Plan: Premium Monthly', 'Total: £9.99']))
+    assert_that([match.group(1) for match in match_lines(r'^(\w+): ', lines)], is_(['Plan', 'Total']))
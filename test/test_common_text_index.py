@@ -0,0 +1,28 @@
+import re
+
+from bs4 import BeautifulSoup
+from hamcrest import assert_that, is_
+
+from beancount_gmail.common.text_index import TextIndex
+
+EMAIL = ('<html><head><title>Receipt for your donation</title></head>'
+         '<body><p>Your refund</p><p>is on its way <!-- refund note --></p><p>Total</p></body></html>')
+
+
+def test_search_returns_matching_string_without_spanning_strings():
+    soup = BeautifulSoup(EMAIL, "html.parser")
+    index = TextIndex(soup)
+
+    assert_that(index.search(re.compile("refund ")), is_(" refund note "))
+    assert_that(index.search(re.compile("Your refund")), is_("Your refund"))
+    assert_that(index.search(re.compile("refund is")), is_(None))
+    assert_that(index.search(re.compile("on its way")), is_("is on its way "))
+
+
+def test_search_within_tag():
+    soup = BeautifulSoup(EMAIL, "html.parser")
+    index = TextIndex(soup)
+
+    assert_that(index.search(re.compile("donation"), soup.title), is_("Receipt for your donation"))
+    assert_that(index.search(re.compile("Total"), soup.title), is_(None))
+    assert_that(index.search(re.compile("Total"), soup.body), is_("Total"))
@@ -1,15 +1,20 @@
 import datetime
+import time
 from datetime import timedelta
 from unittest.mock import Mock, call
 
 import gmails.retriever
 import pytest
-from beancount.core.data import Open, Balance, Transaction
+from beancount.core.amount import Amount
+from beancount.core.data import Open, Balance, Transaction, Posting
+from beancount.core.number import D
 from hamcrest import assert_that, is_, instance_of
 
-from beancount_gmail.downloading_and_matching import get_search_dates, download_email_receipts, pairs_match
+from beancount_gmail.downloading_and_matching import get_search_dates, download_email_receipts, pairs_match, \
+    get_search_windows, download_and_match_transactions
 from beancount_gmail.email_parser_protocol import EmailParser
 from beancount_gmail.email_processing import get_message_date
+from beancount_gmail.receipt import Receipt, TOTAL
 from test.matchers import _, beautiful_soup_containing_text
 from test.test_importer import _mock_transaction, _mock_directive, _mock_receipt, _mock_transaction_with_posting
 
@@ -53,9 +58,34 @@ def test_search_date_ignores_non_transactions():
     assert_that(max_date, is_(datetime.date(2019, 12, 16)))
 
 
+def test_search_windows_are_split_between_distant_transactions():
+    windows = get_search_windows([
+        _mock_transaction(datetime.date(2020, 12, 14)),
+        _mock_transaction(datetime.date(2020, 1, 2)),
+        _mock_directive(datetime.date(2020, 6, 1), Open),
+    ])
+    assert_that(windows, is_([(datetime.date(2020, 1, 2), datetime.date(2020, 1, 3)),
+                              (datetime.date(2020, 12, 14), datetime.date(2020, 12, 15))]))
+
+
+def test_search_windows_merge_when_search_delta_overlaps():
+    windows = get_search_windows([
+        _mock_transaction(datetime.date(2020, 3, 14)),
+        _mock_transaction(datetime.date(2020, 3, 10)),
+        _mock_transaction(datetime.date(2020, 3, 6)),
+        _mock_transaction(datetime.date(2020, 3, 1)),
+        _mock_transaction(datetime.date(2020, 4, 1)),
+    ], timedelta(days=2))
+    assert_that(windows, is_([(datetime.date(2020, 2, 28), datetime.date(2020, 3, 17)),
+                              (datetime.date(2020, 3, 30), datetime.date(2020, 4, 4))]))
+
+
 def test_parser_is_called_for_every_retrieved_email(email_message):
     parser = Mock(spec=EmailParser)
+    parser.tree_builder.return_value = None
+    parser.parse_only.return_value = None
     parser.search_query.return_value = 'from:service@paypal.co.uk'
+    parser.extract_receipts.return_value = []
 
     email1 = email_message('sample_emails/html.eml')
     email2 = email_message('sample_emails/html2.eml')
@@ -83,6 +113,27 @@ def test_parser_is_called_for_every_retrieved_email(email_message):
     ])
 
 
+def test_emails_rejected_by_header_filter_are_not_parsed(email_message, capsys):
+    parser = Mock(spec=EmailParser)
+    parser.tree_builder.return_value = None
+    parser.parse_only.return_value = None
+    parser.header_filter.side_effect = lambda message: 'email2' not in message['Subject']
+    parser.extract_receipts.return_value = []
+
+    email1, email2, email3 = [email_message('sample_emails/{}.eml'.format(name)) for name in ['html', 'html2', 'html3']]
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever.get_messages_for_date_range.return_value = [email1, email2, email3]
+
+    download_email_receipts(parser, retriever, datetime.date(2021, 1, 1), datetime.date(2021, 3, 14))
+
+    parser.extract_receipts.assert_has_calls([
+        call(get_message_date(email1), _(beautiful_soup_containing_text("email1"))),
+        call(get_message_date(email3), _(beautiful_soup_containing_text("email3")))
+    ])
+    assert_that(parser.extract_receipts.call_count, is_(2))
+    assert_that(capsys.readouterr().out, is_(""))
+
+
 @pytest.mark.parametrize("transaction, receipt, result",
                          [(_mock_transaction(datetime.date(2020, 12, 23)),
                            _mock_receipt(datetime.datetime(2021, 3, 14, 12, 32, 20)), False),
@@ -129,3 +180,81 @@ def test_transaction_and_receipt_pairs_match(transaction, receipt, result):
                           ])
 def test_transaction_and_receipt_pairs_match_with_delta(transaction, receipt, delta, result):
     assert_that(pairs_match(transaction, receipt, delta), is_(result))
+
+
+def _parser_returning(description: str, delay: float = 0) -> EmailParser:
+    def extract_receipts(message_date, soup):
+        time.sleep(delay)
+        return [Receipt(message_date, [(description, '1.00 GBP')], [(TOTAL, '1.00 GBP')])]
+
+    parser = Mock(spec=EmailParser)
+    parser.tree_builder.return_value = None
+    parser.parse_only.return_value = None
+    parser.transaction_filter.return_value = True
+    parser.search_query.return_value = description
+    parser.extract_receipts.side_effect = extract_receipts
+    return parser
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("compact_receipts", [False, True])
+def test_parsers_are_matched_in_order_regardless_of_workers(email_message, workers, compact_receipts):
+    transaction = Transaction(dict(), datetime.date(2021, 5, 1), '*', None, 'Narration', set(), set(),
+                              [Posting('Assets:PayPal', Amount(D('-1.00'), 'GBP'), None, None, None, None)])
+
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever.get_messages_for_date_range.side_effect = lambda *args: [email_message('sample_emails/html.eml')]
+
+    download_and_match_transactions([_parser_returning('slow', 0.2), _parser_returning('fast')], retriever,
+                                    [transaction], 'Expenses:Postage', workers=workers,
+                                    compact_receipts=compact_receipts)
+
+    assert_that([posting.meta['description'] for posting in transaction.postings[1:]], is_(['slow', 'fast']))
+
+
+def test_combined_query_retrieves_once_and_dispatches_by_sender(email_message):
+    transaction = Transaction(dict(), datetime.date(2021, 5, 1), '*', None, 'Narration', set(), set(),
+                              [Posting('Assets:PayPal', Amount(D('-1.00'), 'GBP'), None, None, None, None)])
+    paypal = _parser_returning('paypal')
+    paypal.search_query.return_value = 'from:white@gmail.com'
+    ebay = _parser_returning('ebay')
+    ebay.search_query.return_value = 'from:ebay@ebay.com'
+
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever.get_messages_for_date_range.return_value = [email_message('sample_emails/html.eml')]
+
+    download_and_match_transactions([paypal, ebay], retriever, [transaction], 'Expenses:Postage',
+                                    combine_queries=True)
+
+    retriever.get_messages_for_date_range.assert_called_once_with(
+        '(from:white@gmail.com) OR (from:ebay@ebay.com)', datetime.date(2021, 5, 1), datetime.date(2021, 5, 2),
+        _(instance_of(datetime.tzinfo)))
+    ebay.extract_receipts.assert_not_called()
+    assert_that([posting.meta['description'] for posting in transaction.postings[1:]], is_(['paypal']))
+
+
+def test_combined_queries_still_search_separately_for_phrases_which_may_be_in_the_body(email_message):
+    transaction = Transaction(dict(), datetime.date(2021, 5, 1), '*', None, 'Narration', set(), set(),
+                              [Posting('Assets:PayPal', Amount(D('-1.00'), 'GBP'), None, None, None, None)])
+    paypal = _parser_returning('paypal')
+    paypal.search_query.return_value = 'from:white@gmail.com'
+    phrase = _parser_returning('phrase')
+    phrase.search_query.return_value = '"This is a test HTML email1" from:white@gmail.com'
+
+    body_only = email_message('sample_emails/html.eml')
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever.get_messages_for_date_range.side_effect = \
+        lambda query, *args: [body_only] if query == phrase.search_query.return_value else []
+
+    download_and_match_transactions([paypal, phrase], retriever, [transaction], 'Expenses:Postage',
+                                    combine_queries=True)
+
+    assert_that([call.args[0] for call in retriever.get_messages_for_date_range.call_args_list],
+                is_(['"This is a test HTML email1" from:white@gmail.com', 'from:white@gmail.com']))
+    paypal.extract_receipts.assert_not_called()
+    assert_that([posting.meta['description'] for posting in transaction.postings[1:]], is_(['phrase']))
+
+
+def test_options_after_the_search_delta_must_be_passed_by_keyword():
+    with pytest.raises(TypeError):
+        download_and_match_transactions([], Mock(), [], 'Expenses:Postage', timedelta(), None, 4)
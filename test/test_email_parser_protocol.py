@@ -1,3 +1,5 @@
+import email
+import pickle
 import re
 from typing import Callable
 from unittest.mock import Mock
@@ -5,7 +7,8 @@ from unittest.mock import Mock
 from beancount.core.data import Transaction
 from hamcrest import assert_that, is_
 
-from beancount_gmail.email_parser_protocol import transaction_filter, re_filter
+from beancount_gmail.email_parser_protocol import transaction_filter, re_filter, header_filter, header_re_filter
+from beancount_gmail.uk_ebay_email import UKeBayParser
 
 mock_transaction = Mock(spec=Transaction)
 
@@ -44,3 +47,22 @@ def test_re_filter():
     assert_that(re_filter('thimble|needle')(mock_transaction), is_(True))
 
     assert_that(re_filter('NEEDLE', re.IGNORECASE)(mock_transaction), is_(True))
+
+
+def test_header_filter_matches_subject_string_or_uses_callable():
+    message = email.message_from_string("From: ebay@ebay.com\nSubject: =?UTF-8?Q?Order_confirmed?=\n\nBody")
+
+    assert_that(header_filter(None, message), is_(True))
+    assert_that(header_filter("Order confirmed", message), is_(True))
+    assert_that(header_filter("Watched item", message), is_(False))
+    assert_that(header_filter(header_re_filter("^order", re_flags=re.IGNORECASE), message), is_(True))
+    assert_that(header_filter(header_re_filter("paypal", "From"), message), is_(False))
+
+
+def test_worker_copy_drops_the_filters_so_it_can_be_pickled():
+    parser = UKeBayParser(re_filter('eBay'), 'lxml', header_re_filter('order'))
+    worker_parser = pickle.loads(pickle.dumps(parser.for_worker()))
+
+    assert_that(worker_parser.tree_builder(), is_('lxml'))
+    assert_that(worker_parser.header_filter(Mock()), is_(True))
+    assert_that(callable(parser._header_filter_param), is_(True))
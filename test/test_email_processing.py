@@ -1,18 +1,29 @@
+import email
+
 from hamcrest import assert_that, is_
 from unittest.mock import Mock
 
 from beancount_gmail.email_parser_protocol import EmailParser
-from beancount_gmail.email_processing import extract_receipts
+from beancount_gmail.email_processing import extract_receipts, get_message_date
 from beancount_gmail.receipt import Receipt
+from test.matchers import _, beautiful_soup_containing_text
 
 RECEIPT_ONE = Mock(spec=Receipt)
 RECEIPT_TWO = Mock(spec=Receipt)
 RECEIPTS = [RECEIPT_ONE, RECEIPT_TWO]
 
 
+def _mock_parser() -> EmailParser:
+    parser = Mock(spec=EmailParser)
+    parser.tree_builder.return_value = None
+    parser.parse_only.return_value = None
+    parser.extract_receipts_from_text.return_value = None
+    return parser
+
+
 def test_html_is_favoured_over_text_and_parser_is_called_once(email_message):
     message = email_message("sample_emails/html.eml")
-    parser = Mock(spec=EmailParser)
+    parser = _mock_parser()
     parser.extract_receipts.return_value = RECEIPTS
 
     receipts = extract_receipts(parser, message)
@@ -24,7 +35,7 @@ def test_html_is_favoured_over_text_and_parser_is_called_once(email_message):
 
 def test_text_is_given_to_parse_in_absence_of_html(email_message):
     message = email_message("sample_emails/text.eml")
-    parser = Mock(spec=EmailParser)
+    parser = _mock_parser()
     parser.extract_receipts.return_value = RECEIPTS
 
     receipts = extract_receipts(parser, message)
@@ -34,9 +45,21 @@ def test_text_is_given_to_parse_in_absence_of_html(email_message):
     pass
 
 
+def test_plain_text_is_given_directly_to_parsers_which_read_text(email_message):
+    message = email_message("sample_emails/text.eml")
+    parser = _mock_parser()
+    parser.extract_receipts_from_text.return_value = RECEIPTS
+
+    receipts = extract_receipts(parser, message)
+
+    parser.extract_receipts_from_text.assert_called_once_with(get_message_date(message), "This is test text email")
+    parser.extract_receipts.assert_not_called()
+    assert_that(receipts, is_(RECEIPTS))
+
+
 def test_when_parsing_fails_no_receipts_are_returned(email_message):
     message = email_message("sample_emails/html.eml")
-    parser = Mock(spec=EmailParser)
+    parser = _mock_parser()
     parser.extract_receipts.side_effect = Exception("test")
 
     receipts = extract_receipts(parser, message)
@@ -45,9 +68,36 @@ def test_when_parsing_fails_no_receipts_are_returned(email_message):
     assert_that(receipts, is_([]))
 
 
+def test_html_nested_in_mixed_multipart_is_found_and_attachments_are_skipped(email_message):
+    message = email_message("sample_emails/nested-alternative.eml")
+    parser = _mock_parser()
+    parser.extract_receipts.return_value = RECEIPTS
+
+    receipts = extract_receipts(parser, message)
+
+    parser.extract_receipts.assert_called_once_with(get_message_date(message),
+                                                    _(beautiful_soup_containing_text("nested HTML email")))
+    assert_that(receipts, is_(RECEIPTS))
+
+
+def test_text_part_is_used_when_multipart_message_has_no_html():
+    message = email.message_from_string('Date: Mon, 3 May 2021 09:12:40 +0100\n'
+                                        'Content-Type: multipart/mixed; boundary="b"\n\n'
+                                        '--b\nContent-Type: text/plain; charset="UTF-8"\n\nPlain receipt\n'
+                                        '--b\nContent-Type: application/pdf\nContent-Disposition: attachment\n\n'
+                                        'JVBERi0=\n--b--\n')
+    parser = _mock_parser()
+    parser.extract_receipts.return_value = RECEIPTS
+
+    extract_receipts(parser, message)
+
+    parser.extract_receipts.assert_called_once_with(get_message_date(message),
+                                                    _(beautiful_soup_containing_text("Plain receipt")))
+
+
 def test_multipart_message_with_no_text_or_html_content_type_returns_no_receipts(email_message):
     message = email_message('sample_emails/unknown-content-type-multipart.eml')
-    parser = Mock(spec=EmailParser)
+    parser = _mock_parser()
 
     receipts = extract_receipts(parser, message)
 
@@ -57,9 +107,25 @@ def test_multipart_message_with_no_text_or_html_content_type_returns_no_receipts
 
 def test_message_with_no_text_or_html_content_type_returns_no_receipts(email_message):
     message = email_message('sample_emails/unknown-content-type.eml')
-    parser = Mock(spec=EmailParser)
+    parser = _mock_parser()
 
     receipts = extract_receipts(parser, message)
 
     parser.extract_receipts.assert_not_called()
     assert_that(receipts, is_([]))
+
+
+def test_parser_tree_builder_is_favoured_over_the_default(email_message):
+    message = email_message("sample_emails/html.eml")
+    parser = _mock_parser()
+    parser.tree_builder.return_value = "lxml"
+    parser.extract_receipts.return_value = RECEIPTS
+
+    extract_receipts(parser, message, "html.parser")
+
+    assert_that(parser.extract_receipts.call_args[0][1].builder.NAME, is_("lxml"))
+    parser.tree_builder.return_value = None
+
+    extract_receipts(parser, message, "html.parser")
+
+    assert_that(parser.extract_receipts.call_args[0][1].builder.NAME, is_("html.parser"))
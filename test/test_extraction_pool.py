@@ -0,0 +1,99 @@
+import datetime
+import os
+from datetime import timedelta
+
+from beancount.core.amount import Amount
+from beancount.core.data import Transaction, Posting
+from beancount.core.number import D
+from bs4 import BeautifulSoup
+from hamcrest import assert_that, is_, has_length
+
+from beancount_gmail.downloading_and_matching import download_and_match_transactions, extract_all_receipts
+from beancount_gmail.email_parser_protocol import EmailParser, re_filter
+from beancount_gmail.email_processing import extract_receipts
+from beancount_gmail.extraction_pool import ExtractionPool
+from beancount_gmail.mailbox_retriever import MailboxRetriever
+from beancount_gmail.receipt import Receipt, TOTAL
+from beancount_gmail.receipt_cache import ReceiptCache
+
+
+class TitleParser(EmailParser):
+    def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        return [Receipt(message_date, [(soup.get_text(strip=True), '1.00 GBP'), ('P&P', '0.50 GBP')],
+                        [(TOTAL, '1.50 GBP')])]
+
+    def search_query(self) -> str:
+        return 'from:white@gmail.com'
+
+
+class FailingParser(EmailParser):
+    def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        raise ValueError("Cannot parse")
+
+    def search_query(self) -> str:
+        return 'failing'
+
+
+def _records(receipts: list[Receipt]) -> list[tuple]:
+    return [receipt.to_record() for receipt in receipts]
+
+
+def test_pool_returns_the_same_receipts_as_extracting_in_process(email_message):
+    parser = TitleParser(re_filter('Narration'))
+    messages = [email_message('sample_emails/{}.eml'.format(name)) for name in ['html', 'html2', 'html3']]
+
+    with ExtractionPool([FailingParser(), parser], 2, chunk_size=1) as pool:
+        extracted = list(pool.extract_receipts(parser, messages))
+
+    assert_that([_records(receipts) for receipts in extracted],
+                is_([_records(extract_receipts(parser, message)) for message in messages]))
+
+
+def test_emails_which_fail_to_parse_are_still_written_to_excluded_directory(email_message, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parser = FailingParser()
+
+    with ExtractionPool([parser], 2) as pool:
+        extracted = list(pool.extract_receipts(parser, [email_message('sample_emails/html.eml')]))
+
+    assert_that(extracted, is_([None]))
+    assert_that(os.listdir(tmp_path / 'excluded'), has_length(1))
+
+
+def test_emails_which_fail_to_parse_in_the_pool_are_not_cached(email_message, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parser = FailingParser()
+    message = email_message('sample_emails/html.eml')
+    cache = ReceiptCache(str(tmp_path / 'cache'))
+
+    with ExtractionPool([parser], 2) as pool:
+        receipts = extract_all_receipts(parser, [message], cache, pool)
+
+    assert_that(receipts, is_([]))
+    assert_that(cache.get(parser, message), is_(None))
+
+
+def test_transactions_are_matched_in_the_same_order_with_extraction_processes(tmp_path):
+    with open(os.path.join(os.path.dirname(__file__), 'sample_emails/html.eml'), 'rb') as sample:
+        template = sample.read()
+    with open(tmp_path / 'mbox', 'wb') as mbox:
+        for day in range(1, 4):
+            mbox.write(b"From sender Sat May  1 00:00:00 2021\n")
+            mbox.write(template.replace(b"Date: ", "Date: Sat, 0{} May 2021 10:00:00 +0100\nX-Old-Date: ".format(day)
+                                        .encode(), 1) + b"\n\n")
+
+    def transactions():
+        return [Transaction(dict(), datetime.date(2021, 5, day), '*', None, 'Narration', set(), set(),
+                            [Posting('Assets:PayPal', Amount(D('-1.50'), 'GBP'), None, None, None, None)])
+                for day in range(1, 4)]
+
+    sequential, pooled = transactions(), transactions()
+    retriever = MailboxRetriever(str(tmp_path / 'mbox'))
+    download_and_match_transactions(TitleParser(), retriever, sequential, 'Expenses:Postage', timedelta(days=1))
+    download_and_match_transactions(TitleParser(), retriever, pooled, 'Expenses:Postage', timedelta(days=1),
+                                    extraction_processes=2)
+
+    assert_that([transaction.postings for transaction in pooled], is_([transaction.postings
+                                                                       for transaction in sequential]))
+    assert_that(pooled[0].postings, has_length(5))
+
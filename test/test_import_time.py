@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+from hamcrest import assert_that, is_, empty
+
+HEAVY_MODULES = ['gmails', 'googleapiclient', 'bs4', 'lxml', 'jsonpickle', 'pytz']
+
+
+def _modules_loaded_by(statement: str) -> list[str]:
+    script = "import sys\n{}\nprint(' '.join(m for m in {!r} if m in sys.modules))".format(statement, HEAVY_MODULES)
+    return subprocess.run([sys.executable, "-c", script], check=True, capture_output=True,
+                          text=True).stdout.split()
+
+
+@pytest.mark.parametrize("statement", [
+    "import beancount_gmail",
+    "import beancount_gmail; beancount_gmail.GmailImporter",
+    "from beancount_gmail.decorator import gmail_import",
+    "from beancount_gmail.retrieval import MessageRetriever, SerialisedRetriever",
+    "from beancount_gmail.uk_paypal_email import PayPalUKParser",
+    "from beancount_gmail.uk_ebay_email import UKeBayParser",
+    "from beancount_gmail.uk_amazon_email import UKAmazonParser",
+])
+def test_importing_does_not_load_gmail_or_parsing_dependencies(statement):
+    assert_that(_modules_loaded_by(statement), is_(empty()))
+
+
+def test_non_extract_calls_do_not_load_gmail_or_parsing_dependencies():
+    statement = "\n".join([
+        "from unittest.mock import Mock",
+        "from beangulp.importer import Importer",
+        "from beancount_gmail import GmailImporter",
+        "importer = GmailImporter(Mock(spec=Importer), [], 'POSTAGE', 'EMAIL', message_cache_directory='unused')",
+        "importer.identify('file'); importer.account('file'); importer.date('file'); importer.filename('file')",
+    ])
+    assert_that(_modules_loaded_by(statement), is_(empty()))
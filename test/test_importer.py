@@ -2,10 +2,12 @@ import datetime
 from unittest.mock import Mock
 
 from beancount.core.data import Transaction, Account, Amount, create_simple_posting, D
+import pytest
 from beangulp.importer import Importer
 from hamcrest import assert_that, is_
 
 from beancount_gmail import GmailImporter
+from beancount_gmail.decorator import gmail_import
 from beancount_gmail.email_parser_protocol import EmailParser
 from beancount_gmail.receipt import Receipt
 
@@ -28,6 +30,15 @@ def test_support_functions_call_delegate():
     delegate.identify.assert_called_with('filepath')
 
 
+def test_incremental_sync_needs_the_message_cache_directory():
+    with pytest.raises(ValueError):
+        GmailImporter(Mock(spec=Importer), [], 'POSTAGE', 'EMAIL', incremental_sync=True)
+    with pytest.raises(ValueError):
+        gmail_import([], 'EMAIL', 'unused', 'POSTAGE', incremental_sync=True)
+
+    GmailImporter(Mock(spec=Importer), [], 'POSTAGE', 'EMAIL', message_cache_directory='unused', incremental_sync=True)
+
+
 def _mock_receipt(date: datetime, number: str = None) -> Receipt:
     receipt = Mock(spec=Receipt)
     receipt.receipt_date = date
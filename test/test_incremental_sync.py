@@ -0,0 +1,61 @@
+import base64
+import datetime
+import os
+from unittest.mock import Mock
+
+import gmails.retriever
+import pytz
+from hamcrest import assert_that, is_, contains_exactly
+
+from beancount_gmail import message_cache
+from beancount_gmail.incremental_sync import SyncState, SyncingRetriever
+from beancount_gmail.message_cache import MessageCache
+
+EUROPE_LONDON = pytz.timezone('Europe/London')
+
+
+def _raw_email(file_name: str) -> str:
+    with open(os.path.join(os.path.dirname(__file__), file_name), 'rb') as f:
+        return base64.urlsafe_b64encode(f.read()).decode('ascii')
+
+
+def test_gaps_exclude_synced_ranges(tmp_path):
+    state = SyncState(str(tmp_path))
+    state.add_synced('me', 'query', 10, 20)
+    state.add_synced('me', 'query', 30, 40)
+    state.add_synced('me', 'other query', 0, 100)
+
+    assert_that(state.gaps('me', 'query', 0, 50), is_([(0, 10), (20, 30), (40, 50)]))
+    assert_that(state.gaps('me', 'query', 12, 18), is_([]))
+    assert_that(state.gaps('someone else', 'query', 12, 18), is_([(12, 18)]))
+
+
+def test_overlapping_synced_ranges_are_merged(tmp_path):
+    state = SyncState(str(tmp_path))
+    state.add_synced('me', 'query', 10, 20)
+    state.add_synced('me', 'query', 30, 40)
+    state.add_synced('me', 'query', 15, 35)
+
+    assert_that(SyncState(str(tmp_path)).gaps('me', 'query', 0, 50), is_([(0, 10), (40, 50)]))
+
+
+def test_only_unsynced_ranges_are_listed(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_cache, '_download_raw_messages', Mock(return_value={
+        'id1': _raw_email('sample_emails/html.eml'),
+        'id2': _raw_email('sample_emails/html2.eml'),
+        'id3': _raw_email('sample_emails/html3.eml'),
+    }))
+
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever._list_messages_for_days.return_value = [[{'id': 'id1'}, {'id': 'id2'}, {'id': 'id3'}]]
+
+    syncing_retriever = SyncingRetriever(retriever, MessageCache(str(tmp_path)), SyncState(str(tmp_path)), 'me')
+    first = syncing_retriever.get_messages_for_date_range('from:white@gmail.com', datetime.date(2021, 5, 1),
+                                                          datetime.date(2021, 6, 1), EUROPE_LONDON)
+    second = syncing_retriever.get_messages_for_date_range('from:white@gmail.com', datetime.date(2021, 5, 5),
+                                                           datetime.date(2021, 5, 10), EUROPE_LONDON)
+
+    retriever._list_messages_for_days.assert_called_once()
+    assert_that([message.get('Subject') for message in first],
+                contains_exactly('Test HTML email1', 'Test HTML email2', 'Test HTML email3'))
+    assert_that([message.get('Subject') for message in second], contains_exactly('Test HTML email2'))
@@ -0,0 +1,58 @@
+import datetime
+import email
+import mailbox
+import os
+
+import pytz
+import pytest
+from hamcrest import assert_that, contains_exactly
+
+from beancount_gmail.mailbox_retriever import MailboxRetriever
+
+EUROPE_LONDON = pytz.timezone('Europe/London')
+
+SAMPLE_EMAILS = ['sample_emails/html3.eml', 'sample_emails/html.eml', 'sample_emails/html2.eml',
+                 'sample_emails/text.eml']
+
+
+def _add_sample_emails(box: mailbox.Mailbox) -> None:
+    for file_name in SAMPLE_EMAILS:
+        with open(os.path.join(os.path.dirname(__file__), file_name)) as f:
+            box.add(email.message_from_file(f))
+    box.flush()
+
+
+@pytest.fixture(params=['mbox', 'maildir'])
+def mailbox_path(request, tmp_path):
+    if request.param == 'mbox':
+        path = str(tmp_path / 'export.mbox')
+        _add_sample_emails(mailbox.mbox(path))
+    else:
+        path = str(tmp_path / 'Maildir')
+        _add_sample_emails(mailbox.Maildir(path))
+    return path
+
+
+def _subjects(messages):
+    return [message.get('Subject') for message in messages]
+
+
+def test_messages_are_returned_in_date_order_for_date_range(mailbox_path):
+    retriever = MailboxRetriever(mailbox_path)
+
+    messages = retriever.get_messages_for_date_range('from:white@gmail.com', datetime.date(2021, 5, 1),
+                                                     datetime.date(2021, 5, 8), EUROPE_LONDON)
+
+    assert_that(_subjects(messages), contains_exactly('Test HTML email1', 'Test text email', 'Test HTML email2'))
+
+
+def test_messages_are_filtered_by_search_query(mailbox_path):
+    retriever = MailboxRetriever(mailbox_path)
+
+    assert_that(_subjects(retriever.get_messages_for_date_range("'HTML email' from:white@gmail.com",
+                                                                datetime.date(2021, 5, 1), datetime.date(2021, 6, 1),
+                                                                EUROPE_LONDON)),
+                contains_exactly('Test HTML email1', 'Test HTML email2', 'Test HTML email3'))
+    assert_that(_subjects(retriever.get_messages_for_date_range('from:ebay@ebay.com', datetime.date(2021, 5, 1),
+                                                                datetime.date(2021, 6, 1), EUROPE_LONDON)),
+                contains_exactly())
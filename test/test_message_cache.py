@@ -0,0 +1,123 @@
+import base64
+import datetime
+import os
+from unittest.mock import Mock
+
+import gmails.retriever
+import httplib2
+import pytest
+import pytz
+from googleapiclient import http
+from googleapiclient.errors import HttpError
+from hamcrest import assert_that, is_, contains_exactly, has_length, less_than_or_equal_to
+
+from beancount_gmail import message_cache
+from beancount_gmail.message_cache import MessageCache, CachingRetriever
+
+
+def _raw_email(file_name: str) -> str:
+    with open(os.path.join(os.path.dirname(__file__), file_name), 'rb') as f:
+        return base64.urlsafe_b64encode(f.read()).decode('ascii')
+
+
+class FakeBatch(object):
+    """ Answers each request in a batch with the response or exception given for its message id """
+    responses: dict = dict()
+
+    def __init__(self, callback, batch_uri) -> None:
+        self._callback = callback
+        self._request_ids = []
+
+    def add(self, request, request_id) -> None:
+        self._request_ids.append(request_id)
+
+    def execute(self) -> None:
+        for request_id in self._request_ids:
+            response = FakeBatch.responses[request_id]
+            if isinstance(response, Exception):
+                self._callback(request_id, None, response)
+            else:
+                self._callback(request_id, {'id': request_id, 'raw': response}, None)
+
+
+def _http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), b'')
+
+
+def test_cached_messages_are_returned(tmp_path):
+    cache = MessageCache(str(tmp_path))
+    cache.put({'id1': 'raw1', 'id2': 'raw2'})
+
+    assert_that(cache.get(['id1', 'id3']), is_({'id1': 'raw1'}))
+    assert_that(MessageCache(str(tmp_path)).get(['id2']), is_({'id2': 'raw2'}))
+
+
+def test_least_recently_used_messages_are_evicted_when_cache_is_full(tmp_path):
+    raw1, raw2, raw3 = [base64.urlsafe_b64encode(os.urandom(750)).decode('ascii') for _ in range(3)]
+
+    cache = MessageCache(str(tmp_path), max_size=2000)
+    cache.put({'id1': raw1})
+    cache.put({'id2': raw2})
+    cache.get(['id1'])
+    cache.put({'id3': raw3})
+
+    assert_that(cache.size(), is_(less_than_or_equal_to(2000)))
+    assert_that(cache.get(['id1', 'id2', 'id3']), is_({'id1': raw1, 'id3': raw3}))
+
+
+def test_only_missing_messages_are_downloaded(tmp_path, monkeypatch):
+    raw1 = _raw_email('sample_emails/html.eml')
+    raw2 = _raw_email('sample_emails/html2.eml')
+
+    cache = MessageCache(str(tmp_path))
+    cache.put({'id1': raw1})
+
+    download = Mock(return_value={'id2': raw2})
+    monkeypatch.setattr(message_cache, '_download_raw_messages', download)
+
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    retriever._list_messages_for_days.return_value = [[{'id': 'id1'}, {'id': 'id2'}]]
+
+    messages = CachingRetriever(retriever, cache).get_messages_for_date_range(
+        'from:service@paypal.co.uk', datetime.date(2021, 1, 1), datetime.date(2021, 3, 14))
+
+    download.assert_called_once_with(retriever, ['id2'])
+    assert_that(messages, has_length(2))
+    assert_that([message.get('Subject') for message in messages],
+                contains_exactly('Test HTML email1', 'Test HTML email2'))
+    assert_that(cache.get(['id2']), is_({'id2': raw2}))
+
+
+def test_messages_deleted_since_they_were_listed_are_skipped(monkeypatch):
+    monkeypatch.setattr(http, 'BatchHttpRequest', FakeBatch)
+    monkeypatch.setattr(FakeBatch, 'responses', {'id1': 'raw1', 'id2': _http_error(404), 'id3': _http_error(410)})
+
+    raw_messages = message_cache._download_raw_messages(Mock(), ['id1', 'id2', 'id3'])
+
+    assert_that(raw_messages, is_({'id1': 'raw1'}))
+
+
+def test_other_download_failures_stop_the_run(monkeypatch):
+    monkeypatch.setattr(http, 'BatchHttpRequest', FakeBatch)
+    monkeypatch.setattr(FakeBatch, 'responses', {'id1': 'raw1', 'id2': _http_error(404), 'id3': _http_error(403)})
+
+    with pytest.raises(HttpError) as raised:
+        message_cache._download_raw_messages(Mock(), ['id1', 'id2', 'id3'])
+
+    assert_that(raised.value.resp.status, is_(403))
+
+
+def test_messages_are_listed_and_downloaded_through_a_real_gmails_retriever(tmp_path, monkeypatch):
+    service = Mock()
+    service.users().messages().list().execute.return_value = {'messages': [{'id': 'id1'}]}
+    monkeypatch.setattr(gmails.retriever.Retriever, '_get_credentials', Mock())
+    monkeypatch.setattr(gmails.retriever.Retriever, '_build_service', Mock(return_value=service))
+    monkeypatch.setattr(http, 'BatchHttpRequest', FakeBatch)
+    monkeypatch.setattr(FakeBatch, 'responses', {'id1': _raw_email('sample_emails/html.eml')})
+
+    retriever = gmails.retriever.Retriever('beancount-gmail', 'white@gmail.com', str(tmp_path))
+    messages = CachingRetriever(retriever, MessageCache(str(tmp_path))).get_messages_for_date_range(
+        'from:service@paypal.co.uk', datetime.date(2021, 1, 1), datetime.date(2021, 3, 14), pytz.utc)
+
+    assert_that([message.get('Subject') for message in messages], contains_exactly('Test HTML email1'))
+    service.users().messages().get.assert_called_once_with(userId='white@gmail.com', id='id1', format='raw')
@@ -0,0 +1,50 @@
+import re
+
+import pytest
+from beancount.core.amount import A
+from hamcrest import assert_that, is_
+
+from beancount_gmail.money import parse_money, tokenise_money
+from beancount_gmail.receipt import Receipt
+
+
+def _previous_parse(money_string: str, negate: bool):
+    amount = A(re.match(r"([^-+0-9]+)?(.*)", money_string).group(2))
+    return -amount if negate else amount
+
+
+@pytest.mark.parametrize("money_string,tokens", [
+    ("£4.99 GBP", ("4.99", "GBP")),
+    ("4.99 GBP", ("4.99", "GBP")),
+    ("$1234 USD", ("1234", "USD")),
+    ("£-0.50 GBP", ("-0.50", "GBP")),
+    ("+.5 PLN", ("+.5", "PLN")),
+    ("4.99 GBP.", None),
+    ("4.99  GBP", None),
+    ("1,234.00 GBP", None),
+    ("4.99", None),
+    ("4.9.9 GBP", None),
+])
+def test_tokenise_money(money_string, tokens):
+    assert_that(tokenise_money(money_string), is_(tokens))
+
+
+@pytest.mark.parametrize("money_string", ["£4.99 GBP", "4.99 GBP", "$99.99 USD", "£-0.50 GBP", "+.5 PLN",
+                                          "4.99 GBP.", "4.99  GBP", "£12 GBP extra", "GBP 4.99 GBP\n"])
+@pytest.mark.parametrize("negate", [False, True])
+def test_parse_money_matches_previous_parsing(money_string, negate):
+    assert_that(parse_money(money_string, negate), is_(_previous_parse(money_string, negate)))
+
+
+@pytest.mark.parametrize("money_string", ["£4.99", "1,234.00 GBP", "4.9.9 GBP", ""])
+def test_parse_money_rejects_strings_without_an_amount(money_string):
+    with pytest.raises(ValueError):
+        parse_money(money_string)
+
+
+def test_receipt_parses_each_string_once():
+    parse_money.cache_clear()
+    Receipt(None, [("Item", "£4.99 GBP"), ("Other", "£1.00 GBP")], [("Total", "£5.99 GBP")])
+
+    info = parse_money.cache_info()
+    assert_that((info.hits, info.misses), is_((0, 3)))
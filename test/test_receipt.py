@@ -1,4 +1,5 @@
 import datetime
+import pickle
 from typing import Any
 
 from beancount.core.amount import Amount
@@ -9,7 +10,7 @@ from hamcrest.core.base_matcher import BaseMatcher, T
 from hamcrest.core.description import Description
 from hamcrest.core.string_description import StringDescription
 
-from beancount_gmail.receipt import Receipt, TOTAL
+from beancount_gmail.receipt import Receipt, TOTAL, receipt_from_record
 
 RECEIPT_DATETIME = datetime.datetime(2020, 3, 14, 10, 10, 0)
 NARRATION = 'Test Narration'
@@ -60,6 +61,18 @@ def test_postage_posting_is_added() -> None:
                             ])
 
 
+def test_receipt_is_unchanged_by_conversion_to_record() -> None:
+    receipt = Receipt(RECEIPT_DATETIME, [('Detail 1', '£1.00 GBP'), ('Detail 2', '2.50 GBP')],
+                      [(TOTAL, '3.50 GBP'), ('Postage and packaging', '0.99 GBP')], negate=True)
+
+    copy = receipt_from_record(receipt.to_record())
+
+    assert_that(copy.receipt_date, is_(receipt.receipt_date))
+    assert_that(copy.receipt_details, is_(receipt.receipt_details))
+    assert_that((copy.sub_total, copy.total, copy.postage_and_packing),
+                is_((receipt.sub_total, receipt.total, receipt.postage_and_packing)))
+
+
 def _assert_posting_details(transaction: Transaction, posting_details: list[dict[str, Any]]) -> None:
     assert_that(len(transaction.postings), is_(len(posting_details)))
     for index, posting_detail in enumerate(posting_details):
@@ -129,3 +142,12 @@ def receipt_with_one_detail(param: dict):
             return True
 
     return ReceiptWithDetailMatcher()
+
+
+def test_slotted_receipt_pickles_its_attributes() -> None:
+    receipt = Receipt(RECEIPT_DATETIME, [('Detail 1', '1.00 GBP')], [(TOTAL, '1.00 GBP')], negate=False)
+
+    copy = pickle.loads(pickle.dumps(receipt))
+
+    assert_that(hasattr(receipt, '__dict__'), is_(False))
+    assert_that(copy.__getstate__(), is_(receipt.__getstate__()))
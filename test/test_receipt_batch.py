@@ -0,0 +1,73 @@
+import datetime
+from datetime import timedelta, timezone
+
+import pytest
+from beancount.core.data import Transaction
+from hamcrest import assert_that, is_, contains_exactly
+
+from beancount_gmail.receipt import Receipt, TOTAL
+from beancount_gmail.receipt_batch import ReceiptBatch
+from beancount_gmail.receipt_matching import ReceiptMatcher
+from test.test_importer import _mock_transaction_with_posting
+
+POSTAGE_ACCOUNT = 'Expenses:Postage'
+
+RECEIPTS = [
+    Receipt(datetime.datetime(2021, 3, 14, 10, 10, 5, 120, tzinfo=timezone(timedelta(hours=1))),
+            [('Detail 1', '£1.00 GBP'), ('Détail 2 "quoted"', '2.5 GBP')],
+            [(TOTAL, '3.50 GBP'), ('Postage and packaging', '0.99 GBP')], negate=True),
+    Receipt(datetime.datetime(2021, 3, 15, 23, 59, 59), [], total='12 USD'),
+    Receipt(datetime.datetime(2021, 3, 13, 0, 0, tzinfo=timezone.utc), [('Detail 3', '1.000 PLN')],
+            [(TOTAL, '1.000 PLN')]),
+]
+
+
+def _receipt_state(receipt: Receipt) -> dict:
+    state = receipt.__getstate__()
+    state['receipt_date_offset'] = receipt.receipt_date.utcoffset()
+    return state
+
+
+def test_batch_returns_the_receipts_it_was_given():
+    batch = ReceiptBatch(RECEIPTS)
+
+    assert_that(len(batch), is_(len(RECEIPTS)))
+    assert_that([_receipt_state(receipt) for receipt in batch], is_([_receipt_state(receipt) for receipt in RECEIPTS]))
+    assert_that([batch.date_ordinal(position) for position in range(len(batch))],
+                is_([receipt.receipt_date.date().toordinal() for receipt in RECEIPTS]))
+    with pytest.raises(IndexError):
+        batch[len(RECEIPTS)]
+
+
+def test_batch_postings_match_receipt_postings():
+    batch = ReceiptBatch(RECEIPTS)
+    for position, receipt in enumerate(RECEIPTS):
+        expected = Transaction(dict(), receipt.receipt_date.date(), '*', None, 'Narration', set(), set(), list())
+        actual = Transaction(dict(), receipt.receipt_date.date(), '*', None, 'Narration', set(), set(), list())
+
+        receipt.append_postings(expected, POSTAGE_ACCOUNT)
+        batch.append_postings(position, actual, POSTAGE_ACCOUNT)
+
+        assert_that(actual.postings, is_(expected.postings))
+
+
+def test_matcher_works_on_a_batch():
+    receipts = [Receipt(datetime.datetime(2021, 3, day, 12, 32, 20), [('Detail', total)], total=total)
+                for day, total in [(16, '1.00 CURRENCY'), (14, '2.00 CURRENCY'), (12, '1.00 CURRENCY'),
+                                   (17, '1.00 CURRENCY')]]
+    matcher = ReceiptMatcher(ReceiptBatch(receipts), timedelta(days=2))
+
+    matched = matcher.match(_mock_transaction_with_posting(datetime.date(2021, 3, 14), "-1.00"))
+
+    assert_that([receipt.receipt_date.day for receipt in matched], contains_exactly(16, 12))
+    assert_that([receipt.receipt_date.day for receipt in matcher.unmatched()], contains_exactly(14, 17))
+
+
+def test_extending_a_batch_with_a_batch_keeps_every_receipt():
+    batch = ReceiptBatch(RECEIPTS[2:])
+    batch.extend(ReceiptBatch(RECEIPTS[:2]))
+    batch.extend(batch)
+
+    expected = RECEIPTS[2:] + RECEIPTS[:2]
+    assert_that([_receipt_state(receipt) for receipt in batch],
+                is_([_receipt_state(receipt) for receipt in expected + expected]))
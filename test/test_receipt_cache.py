@@ -0,0 +1,76 @@
+import datetime
+
+from bs4 import BeautifulSoup
+from hamcrest import assert_that, is_, has_length
+
+from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.receipt import Receipt, TOTAL
+from beancount_gmail.receipt_cache import ReceiptCache
+
+
+class CountingParser(EmailParser):
+    def __init__(self, parser_version: str = "1") -> None:
+        super().__init__()
+        self.parser_version = parser_version
+        self.calls = 0
+
+    def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        self.calls += 1
+        return [Receipt(message_date, [('Detail', '1.00 GBP')], [(TOTAL, '1.00 GBP')])]
+
+    def search_query(self) -> str:
+        return 'from:counting@example.com'
+
+    def version(self) -> str:
+        return self.parser_version
+
+
+class OtherCountingParser(CountingParser):
+    pass
+
+
+class FailingParser(CountingParser):
+    def extract_receipts(self, message_date: datetime, soup: BeautifulSoup) -> list[Receipt]:
+        self.calls += 1
+        raise ValueError("Cannot parse")
+
+
+def test_receipts_are_only_extracted_once_per_message(tmp_path, email_message):
+    message = email_message('sample_emails/html.eml')
+    parser = CountingParser()
+
+    first = ReceiptCache(str(tmp_path)).extract_receipts(parser, message)
+    second = ReceiptCache(str(tmp_path)).extract_receipts(parser, message)
+
+    assert_that(parser.calls, is_(1))
+    assert_that(second, has_length(1))
+    assert_that(second[0].total, is_(first[0].total))
+    assert_that(second[0].receipt_details, is_(first[0].receipt_details))
+
+
+def test_emails_which_fail_to_parse_are_not_cached(tmp_path, email_message, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    message = email_message('sample_emails/html.eml')
+    parser = FailingParser()
+    cache = ReceiptCache(str(tmp_path / 'cache'))
+
+    assert_that(cache.extract_receipts(parser, message), is_([]))
+    assert_that(cache.extract_receipts(parser, message), is_([]))
+
+    assert_that(parser.calls, is_(2))
+    assert_that(cache.get(parser, message), is_(None))
+
+
+def test_changing_parser_version_only_invalidates_that_parsers_receipts(tmp_path, email_message):
+    message = email_message('sample_emails/html.eml')
+    cache = ReceiptCache(str(tmp_path))
+    cache.extract_receipts(CountingParser("1"), message)
+    cache.extract_receipts(OtherCountingParser("1"), message)
+
+    cache = ReceiptCache(str(tmp_path))
+    new_version = CountingParser("2")
+    cache.extract_receipts(new_version, message)
+
+    assert_that(new_version.calls, is_(1))
+    assert_that(cache.get(OtherCountingParser("1"), message), has_length(1))
+    assert_that(cache.get(CountingParser("1"), message), is_(None))
@@ -0,0 +1,66 @@
+import datetime
+from datetime import timedelta
+
+import pytest
+from hamcrest import assert_that, is_, empty, contains_exactly
+
+from beancount_gmail.downloading_and_matching import pairs_match
+from beancount_gmail.receipt_matching import ReceiptMatcher, DateWindowIndex
+from test.test_importer import _mock_transaction, _mock_receipt, _mock_transaction_with_posting
+
+
+def test_date_window_index_pops_entries_within_window():
+    index = DateWindowIndex([(datetime.date(2021, 3, 10), 0), (datetime.date(2021, 3, 12), 1),
+                             (datetime.date(2021, 3, 14), 2), (datetime.date(2021, 3, 16), 3),
+                             (datetime.date(2021, 3, 13), 4)])
+
+    assert_that(index.pop_window(datetime.date(2021, 3, 13), 1), contains_exactly(1, 4, 2))
+    assert_that(index.pop_window(datetime.date(2021, 3, 13), 1), is_(empty()))
+    assert_that(index.pop_window(datetime.date(2021, 3, 13), 3), contains_exactly(0, 3))
+
+
+def test_transaction_without_postings_matches_nothing():
+    receipt = _mock_receipt(datetime.datetime(2021, 3, 14, 12, 32, 20), "1.00")
+    matcher = ReceiptMatcher([receipt])
+
+    assert_that(matcher.match(_mock_transaction(datetime.date(2021, 3, 14))), is_(empty()))
+    assert_that(matcher.unmatched(), contains_exactly(receipt))
+
+
+def test_matched_receipts_are_removed():
+    receipt = _mock_receipt(datetime.datetime(2021, 3, 14, 12, 32, 20), "1.00")
+    matcher = ReceiptMatcher([receipt])
+
+    assert_that(matcher.match(_mock_transaction_with_posting(datetime.date(2021, 3, 14), "-1.00")),
+                contains_exactly(receipt))
+    assert_that(matcher.match(_mock_transaction_with_posting(datetime.date(2021, 3, 14), "-1.00")), is_(empty()))
+    assert_that(matcher.unmatched(), is_(empty()))
+
+
+def test_all_matching_receipts_are_returned_in_original_order():
+    first = _mock_receipt(datetime.datetime(2021, 3, 16, 12, 32, 20), "1.00")
+    other = _mock_receipt(datetime.datetime(2021, 3, 14, 12, 32, 20), "2.00")
+    second = _mock_receipt(datetime.datetime(2021, 3, 12, 12, 32, 20), "1.00")
+    too_late = _mock_receipt(datetime.datetime(2021, 3, 17, 12, 32, 20), "1.00")
+    matcher = ReceiptMatcher([first, other, second, too_late], timedelta(days=2))
+
+    assert_that(matcher.match(_mock_transaction_with_posting(datetime.date(2021, 3, 14), "-1.00")),
+                contains_exactly(first, second))
+    assert_that(matcher.unmatched(), contains_exactly(other, too_late))
+
+
+@pytest.mark.parametrize("transaction_date, receipt_date, delta",
+                         [(datetime.date(2021, 12, 24), datetime.datetime(2021, 12, 21, 12, 32, 20), days)
+                          for days in range(0, 5)] +
+                         [(datetime.date(2021, 12, 20), datetime.datetime(2021, 12, 25, 12, 32, 20), days)
+                          for days in range(3, 8)] +
+                         [(datetime.date(2021, 1, 1), datetime.datetime(2020, 12, 31, 23, 59, 59), 1),
+                          (datetime.date(2021, 1, 1), datetime.datetime(2021, 1, 1, 0, 0, 0), 0)])
+def test_matcher_agrees_with_pairs_match(transaction_date, receipt_date, delta):
+    search_delta = timedelta(days=delta)
+    transaction = _mock_transaction_with_posting(transaction_date, "-1.00")
+    receipt = _mock_receipt(receipt_date, "1.00")
+
+    matched = ReceiptMatcher([receipt], search_delta).match(transaction)
+
+    assert_that(len(matched) == 1, is_(pairs_match(transaction, receipt, search_delta)))
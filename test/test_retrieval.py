@@ -0,0 +1,88 @@
+import datetime
+import threading
+from unittest.mock import MagicMock, Mock
+
+import gmails.retriever
+import pytest
+from beancount.core.amount import Amount
+from beancount.core.data import Transaction, Posting
+from beancount.core.number import D
+from hamcrest import assert_that, is_, has_length, instance_of, same_instance, greater_than
+
+from beancount_gmail.downloading_and_matching import download_and_match_transactions
+from beancount_gmail.email_parser_protocol import EmailParser
+
+from beancount_gmail.message_cache import CachingRetriever, MessageCache
+from beancount_gmail.retrieval import ThreadLocalRetriever, SerialisedRetriever, create_retriever, \
+    is_thread_safe, shared_retriever
+
+
+def test_each_thread_gets_its_own_gmail_retriever():
+    created = []
+
+    def create() -> gmails.retriever.Retriever:
+        retriever = Mock(spec=gmails.retriever.Retriever)
+        retriever.get_messages_for_date_range.return_value = []
+        created.append(retriever)
+        return retriever
+
+    retriever = ThreadLocalRetriever(create)
+    threads = [threading.Thread(target=retriever.get_messages_for_date_range, args=('query', None, None))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    retriever.get_messages_for_date_range('query', None, None)
+    retriever.get_messages_for_date_range('query', None, None)
+
+    assert_that(created, has_length(4))
+    assert_that(created[-1].get_messages_for_date_range.call_count, is_(2))
+
+
+def test_gmail_credentials_are_only_requested_once_across_workers(tmp_path, monkeypatch):
+    run_flow = Mock()
+    monkeypatch.setattr(gmails.retriever.client, 'flow_from_clientsecrets', Mock())
+    monkeypatch.setattr(gmails.retriever.file, 'Storage', Mock())
+    monkeypatch.setattr(gmails.retriever.tools, 'run_flow', run_flow)
+    build_service = Mock(side_effect=lambda credentials: MagicMock())
+    monkeypatch.setattr(gmails.retriever.Retriever, '_build_service', build_service)
+
+    transaction = Transaction(dict(), datetime.date(2021, 5, 1), '*', None, 'Narration', set(), set(),
+                              [Posting('Assets:PayPal', Amount(D('-1.00'), 'GBP'), None, None, None, None)])
+    parsers = [Mock(spec=EmailParser) for _ in range(4)]
+    every_worker_started = threading.Barrier(len(parsers))
+    for position, parser in enumerate(parsers):
+        parser.transaction_filter.side_effect = lambda _: every_worker_started.wait(5) >= 0
+        parser.search_query.return_value = 'from:parser{}@example.com'.format(position)
+
+    download_and_match_transactions(parsers, create_retriever('white@gmail.com', str(tmp_path)), [transaction],
+                                    'Expenses:Postage', workers=4)
+
+    run_flow.assert_called_once()
+    assert_that(build_service.call_count, is_(greater_than(0)))
+    for call in build_service.call_args_list:
+        assert_that(call.args[0], is_(same_instance(run_flow.return_value)))
+
+
+def test_created_retrievers_are_shared_without_a_lock(tmp_path):
+    for message_cache_directory, incremental_sync in [(None, False), (str(tmp_path), False), (str(tmp_path), True)]:
+        retriever = create_retriever('white@gmail.com', str(tmp_path), message_cache_directory,
+                                     incremental_sync=incremental_sync)
+
+        assert_that(is_thread_safe(retriever), is_(True))
+        assert_that(shared_retriever(retriever), is_(same_instance(retriever)))
+
+
+def test_other_retrievers_are_serialised(tmp_path):
+    retriever = Mock(spec=gmails.retriever.Retriever)
+    cached = CachingRetriever(retriever, MessageCache(str(tmp_path)))
+
+    assert_that(is_thread_safe(cached), is_(False))
+    assert_that(shared_retriever(retriever), is_(instance_of(SerialisedRetriever)))
+    assert_that(shared_retriever(cached), is_(instance_of(SerialisedRetriever)))
+
+
+def test_incremental_sync_needs_a_message_cache_directory(tmp_path):
+    with pytest.raises(ValueError):
+        create_retriever('white@gmail.com', str(tmp_path), incremental_sync=True)
@@ -0,0 +1,54 @@
+import email
+
+from hamcrest import assert_that, is_
+
+from beancount_gmail.search_query import SearchQuery, MessageDispatcher, combine_search_queries, message_text
+
+AMAZON_QUERY = r'\'Your Amazon.co.uk order confirmation\' auto-confirm@amazon.co.uk'
+
+
+def _message(sender: str, subject: str, body: str = "Body"):
+    return email.message_from_string("From: {}\nSubject: {}\nTo: me@gmail.com\n\n{}".format(sender, subject, body))
+
+
+def test_from_operator_matches_sender():
+    query = SearchQuery('from:service@paypal.co.uk')
+    assert_that(query.matches(_message('PayPal <service@paypal.co.uk>', 'Receipt')), is_(True))
+    assert_that(query.matches(_message('eBay <ebay@ebay.com>', 'Receipt')), is_(False))
+
+
+def test_quoted_phrases_and_words_are_not_answered_from_headers():
+    query = SearchQuery(AMAZON_QUERY)
+    body_only = _message('auto-confirm@amazon.co.uk', 'Your order', 'Your Amazon.co.uk order confirmation')
+
+    shipped = _message('auto-confirm@amazon.co.uk', 'Your order', 'Your Amazon.co.uk order has shipped')
+
+    assert_that(query.matches(body_only), is_(True))
+    assert_that(query.answerable(), is_(False))
+    assert_that(query.matches(body_only, message_text(body_only)), is_(True))
+    assert_that(query.matches(shipped, message_text(shipped)), is_(False))
+    assert_that(SearchQuery('from:ebay@ebay.com -subject:"watched item"').answerable(), is_(True))
+
+
+def test_negated_terms_and_encoded_headers():
+    query = SearchQuery('from:ebay@ebay.com -subject:"watched item"')
+    assert_that(query.matches(_message('ebay@ebay.com', '=?UTF-8?Q?Order_confirmed?=')), is_(True))
+    assert_that(query.matches(_message('ebay@ebay.com', 'Your Watched item is ending')), is_(False))
+
+
+def test_queries_which_cannot_be_evaluated_match_everything():
+    assert_that(SearchQuery('label:receipts').matches(_message('a@b.com', 'Hello')), is_(True))
+    assert_that(SearchQuery('from:a@b.com OR from:c@d.com').matches(_message('x@y.com', 'Hello')), is_(True))
+
+
+def test_combined_query():
+    assert_that(combine_search_queries(['from:a@b.com']), is_('from:a@b.com'))
+    assert_that(combine_search_queries(['from:a@b.com', 'from:c@d.com']), is_('(from:a@b.com) OR (from:c@d.com)'))
+
+
+def test_dispatcher_returns_matching_queries_in_order():
+    dispatcher = MessageDispatcher(['from:service@paypal.co.uk', 'from:ebay@ebay.com', AMAZON_QUERY, 'label:all'])
+
+    assert_that(dispatcher.dispatch(_message('eBay <EBAY@ebay.com>', 'Order confirmed')), is_([1, 2, 3]))
+    assert_that(dispatcher.dispatch(_message('auto-confirm@amazon.co.uk', 'Your Amazon.co.uk order confirmation')),
+                is_([2, 3]))
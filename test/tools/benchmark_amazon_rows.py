@@ -0,0 +1,31 @@
+import sys
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+from beancount_gmail.common.parsing import extract_row_text, iter_row_text
+from beancount_gmail.uk_amazon_email.parsing import PRODUCT_SUGGESTIONS
+from test.tools.benchmarking import mismatches, read_samples, sample_files, sample_html_pattern, time_calls
+
+
+def all_interesting_rows(soup: Tag) -> list[list[str]]:
+    """ The previous approach: the text of every row, then truncated at the product suggestions and filtered """
+    table_text = [extract_row_text(row) for row in soup.find_all('tr')]
+    end = next((position for position, row in enumerate(table_text) if PRODUCT_SUGGESTIONS in row), -1)
+    order_only = table_text[0:end] if end > 0 else table_text
+    return [row for row in order_only if len([entry for entry in row if '£' in entry]) > 0]
+
+
+def walked_interesting_rows(soup: Tag) -> list[list[str]]:
+    return list(iter_row_text(soup, stop_at=PRODUCT_SUGGESTIONS, containing='£'))
+
+
+if __name__ == '__main__':
+    sample_soups = [BeautifulSoup(html, "lxml") for html in
+                    read_samples(sample_files(*sys.argv[1:2] or [sample_html_pattern("uk_amazon_email")]))]
+    repeats = 5
+
+    all_time, expected = time_calls(all_interesting_rows, sample_soups, repeats)
+    walked_time, actual = time_calls(walked_interesting_rows, sample_soups, repeats)
+    print("{} emails, {} mismatches, every row {:.3f}s, walking to the sentinel {:.3f}s ({:.1f}x)".format(
+        len(sample_soups), mismatches(expected, actual), all_time, walked_time, all_time / walked_time))
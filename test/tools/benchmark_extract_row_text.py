@@ -0,0 +1,38 @@
+import sys
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+from beancount_gmail.common.parsing import extract_row_text, extract_text
+from test.tools.benchmarking import mismatches, read_samples, sample_files, time_calls
+
+
+def reparsing_extract_row_text(row: Tag) -> list[str]:
+    """ The previous implementation, which parses a copy of the row to remove nested tables """
+    row_copy = BeautifulSoup(str(row), "html.parser")
+    cell_text = []
+    for cell in row_copy.find_all(['td', 'th']):
+        [table.decompose() for table in cell.find_all('table')]
+        cell_text.append(extract_text(cell))
+    return cell_text
+
+
+def rows_and_tables(html: list[str]) -> list[Tag]:
+    elements = []
+    for email_html in html:
+        elements.extend(BeautifulSoup(email_html, "html.parser").find_all(['tr', 'table']))
+    return elements
+
+
+if __name__ == '__main__':
+    files = sample_files(*sys.argv[1:2])
+    sample_elements = rows_and_tables(read_samples(files))
+    repeats = 3
+
+    reparsing_time, expected = time_calls(reparsing_extract_row_text, sample_elements, repeats)
+    walking_time, actual = time_calls(extract_row_text, sample_elements, repeats)
+
+    print("{} rows and tables from {} files, {} mismatches".format(len(sample_elements), len(files),
+                                                                   mismatches(expected, actual)))
+    print("Reparsing: {:.3f}s, walking: {:.3f}s ({:.1f}x)".format(reparsing_time, walking_time,
+                                                                  reparsing_time / walking_time))
@@ -0,0 +1,61 @@
+import re
+import sys
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag, NavigableString
+
+from beancount_gmail.common.parsing import extract_text
+from test.tools.benchmarking import mismatches, read_samples, sample_files, time_calls
+
+
+def recursive_extract_text(element: Tag) -> str:
+    """ The previous implementation, which recurses and concatenates strings """
+    text = ''
+    to_append = None
+
+    def remove_unwanted_white_spaces(s: str) -> str:
+        return re.sub(r' {2,}', ' ', re.sub(r'[\n\t]', r' ', re.sub(u'\xa0', ' ', s.strip())))
+
+    for elem in element.children:
+        if isinstance(elem, NavigableString):
+            if elem.strip():
+                s = remove_unwanted_white_spaces(elem.string.strip())
+                text += to_append + " " + s if to_append else s
+                to_append = None
+        elif elem.name == 'a' or elem.name == 'span':
+            to_append = to_append + " " + remove_unwanted_white_spaces(elem.text) if to_append \
+                else remove_unwanted_white_spaces(elem.text)
+        else:
+            extracted = recursive_extract_text(elem)
+            if to_append and extracted:
+                extracted = to_append + ' ' + extracted
+                to_append = None
+            text += extracted
+
+    if to_append:
+        text += to_append
+
+    return text
+
+
+def elements(html: list[str]) -> list[Tag]:
+    found = []
+    for email_html in html:
+        soup = BeautifulSoup(email_html, "html.parser")
+        found.append(soup)
+        found.extend(soup.find_all(['table', 'tr', 'td', 'th', 'div']))
+    return found
+
+
+if __name__ == '__main__':
+    files = sample_files(*sys.argv[1:2])
+    sample_elements = elements(read_samples(files))
+    repeats = 3
+
+    recursive_time, expected = time_calls(recursive_extract_text, sample_elements, repeats)
+    iterative_time, actual = time_calls(extract_text, sample_elements, repeats)
+
+    print("{} elements from {} files, {} mismatches".format(len(sample_elements), len(files),
+                                                            mismatches(expected, actual)))
+    print("Recursive: {:.3f}s, iterative: {:.3f}s ({:.1f}x)".format(recursive_time, iterative_time,
+                                                                    recursive_time / iterative_time))
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import beangulp.importer",
+    "import beancount_gmail",
+    "import beancount_gmail; beancount_gmail.GmailImporter",
+    "import beancount_gmail.downloading_and_matching",
+    "import beancount_gmail.retrieval; import gmails.retriever",
+]
+
+
+def import_time(statement: str) -> int:
+    """ Returns the microseconds spent importing modules for statement, as reported by python -X importtime """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], check=True,
+                            capture_output=True, text=True).stderr
+    return sum(int(line.split('|')[0].split(':')[1]) for line in stderr.splitlines()
+               if line.startswith("import time:") and line.split('|')[0].split(':')[1].strip().isdigit())
+
+
+if __name__ == '__main__':
+    for import_statement in STATEMENTS:
+        print("{:>8.1f}ms  {}".format(import_time(import_statement) / 1000, import_statement))
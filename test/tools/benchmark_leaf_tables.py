@@ -0,0 +1,32 @@
+import sys
+
+from bs4 import BeautifulSoup
+from bs4.element import Comment, Tag
+
+from beancount_gmail.common.parsing import leaf_tables
+from test.tools.benchmarking import mismatches, read_samples, sample_files, time_calls
+
+
+def searching_leaf_tables(soup: Tag, strip_comments: bool = False) -> list[Tag]:
+    """ The previous approach, a comment removal pass and then a search below every table for a nested table """
+    if strip_comments:
+        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+            comment.extract()
+    return [table for table in soup.find_all('table') if table.find('table') is None]
+
+
+def time_leaf_tables(find, html: list[str], strip_comments: bool) -> tuple[float, list[list[str]]]:
+    soups = [BeautifulSoup(email_html, "html.parser") for email_html in html]
+    elapsed, tables = time_calls(lambda soup: find(soup, strip_comments), soups, 1)
+    return elapsed, [[str(table) for table in found] for found in tables]
+
+
+if __name__ == '__main__':
+    sample_html = read_samples(sample_files(*sys.argv[1:2]))
+
+    for strip in [False, True]:
+        searching_time, expected = time_leaf_tables(searching_leaf_tables, sample_html, strip)
+        walking_time, actual = time_leaf_tables(leaf_tables, sample_html, strip)
+        print("strip_comments={}: {} emails, {} mismatches, searching {:.3f}s, walking {:.3f}s ({:.1f}x)".format(
+            strip, len(sample_html), mismatches(expected, actual), searching_time, walking_time,
+            searching_time / walking_time))
@@ -0,0 +1,40 @@
+import datetime
+import sys
+import time
+
+import pytz
+
+from beancount_gmail.downloading_and_matching import download_email_receipts
+from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.mailbox_retriever import MailboxRetriever
+from beancount_gmail.uk_amazon_email import UKAmazonParser
+from beancount_gmail.uk_ebay_email import UKeBayParser
+from beancount_gmail.uk_paypal_email import PayPalUKParser
+
+PARSERS: dict[str, EmailParser] = {
+    'amazon': UKAmazonParser(),
+    'ebay': UKeBayParser(),
+    'paypal': PayPalUKParser(),
+}
+
+
+def benchmark_mailbox_import(path: str, parser: EmailParser,
+                             after_date: datetime.date, before_date: datetime.date) -> None:
+    start = time.perf_counter()
+    retriever = MailboxRetriever(path)
+    indexed = time.perf_counter()
+    messages = retriever.get_messages_for_date_range(parser.search_query(), after_date, before_date,
+                                                     pytz.timezone('Europe/London'))
+    retrieved = time.perf_counter()
+    receipts = download_email_receipts(parser, retriever, after_date, before_date)
+    parsed = time.perf_counter()
+
+    print("Indexed mailbox in {:.2f}s".format(indexed - start))
+    print("Retrieved {} messages in {:.2f}s".format(len(messages), retrieved - indexed))
+    print("Retrieved and parsed {} receipts in {:.2f}s ({:.1f} messages/s)".format(
+        len(receipts), parsed - retrieved, len(messages) / max(parsed - retrieved, 1e-9)))
+
+
+if __name__ == '__main__':
+    benchmark_mailbox_import(sys.argv[1], PARSERS[sys.argv[2]],
+                             datetime.date.fromisoformat(sys.argv[3]), datetime.date.fromisoformat(sys.argv[4]))
@@ -0,0 +1,67 @@
+import re
+import time
+from datetime import datetime
+from typing import Callable
+
+from beancount.core.amount import A, Amount
+from bs4 import BeautifulSoup
+
+import beancount_gmail.receipt
+from beancount_gmail.money import parse_money
+from beancount_gmail.uk_amazon_email import UKAmazonParser
+from beancount_gmail.uk_ebay_email import UKeBayParser
+from beancount_gmail.uk_paypal_email import PayPalUKParser
+from test.tools.benchmarking import mismatches, read_samples, sample_files, sample_html_pattern
+
+PARSERS = [("uk_paypal_email", PayPalUKParser), ("uk_ebay_email", UKeBayParser), ("uk_amazon_email", UKAmazonParser)]
+
+REPEATS: int = 200
+
+
+def previous_money_string_to_amount(money_string: str, negate: bool) -> Amount:
+    """ The previous approach, an uncompiled regular expression to drop the symbol and then beancount's parser """
+    amount = A(re.match(r"([^-+0-9]+)?(.*)", money_string).group(2))
+    if negate:
+        amount = -amount
+    return amount
+
+
+def sample_money_strings() -> list[tuple[str, bool]]:
+    """ Every money string the bundled parsers parse from the sample emails, in the order they are parsed """
+    seen = []
+
+    def recording_parse_money(money_string: str, negate: bool = False) -> Amount:
+        seen.append((money_string, negate))
+        return parse_money(money_string, negate)
+
+    beancount_gmail.receipt.parse_money = recording_parse_money
+    try:
+        for directory, parser in PARSERS:
+            for html in read_samples(sample_files(sample_html_pattern(directory))):
+                try:
+                    parser().extract_receipts(datetime(2024, 1, 1), BeautifulSoup(html, "lxml"))
+                except Exception:
+                    continue
+    finally:
+        beancount_gmail.receipt.parse_money = parse_money
+    return seen
+
+
+def time_parse(parse: Callable, money_strings: list[tuple[str, bool]], clear_cache: bool) -> tuple[float, list]:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        if clear_cache:
+            parse_money.cache_clear()
+        amounts = [parse(money_string, negate) for money_string, negate in money_strings]
+    return time.perf_counter() - start, amounts
+
+
+if __name__ == '__main__':
+    money_strings = sample_money_strings()
+    previous_time, expected = time_parse(previous_money_string_to_amount, money_strings, False)
+    print("{} money strings, {} distinct, previous parsing {:.3f}s".format(
+        len(money_strings), len(set(money_strings)), previous_time))
+    for name, clear_cache in [("cleared cache", True), ("warm cache", False)]:
+        parse_time, actual = time_parse(parse_money, money_strings, clear_cache)
+        print("{}: {} mismatches, {:.3f}s ({:.1f}x)".format(name, mismatches(expected, actual), parse_time,
+                                                            previous_time / parse_time))
@@ -0,0 +1,54 @@
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator
+
+from beancount_gmail.money import parse_money
+from beancount_gmail.receipt import Receipt, TOTAL
+from beancount_gmail.receipt_batch import ReceiptBatch
+
+START = datetime(2015, 1, 1, 9, 30, tzinfo=timezone(timedelta(hours=1)))
+
+
+class UnslottedReceipt(object):
+    """ The previous layout, the same attributes held in an instance dictionary """
+
+    def __init__(self, receipt: Receipt) -> None:
+        self.__dict__.update(receipt.__getstate__())
+
+
+def sample_receipts(count: int) -> Iterator[Receipt]:
+    """ Receipts spread over several years, each with two line items and postage, with few repeated amounts """
+    for position in range(count):
+        first = position % 10007 + 100
+        second = position % 997 + 50
+        details = [("Item number {} in a typical order description".format(position),
+                    "£{:.2f} GBP".format(first / 100)),
+                   ("Accessory {}".format(position % 53), "£{:.2f} GBP".format(second / 100))]
+        totals = [("Postage and packaging", "£1.99 GBP"), (TOTAL, "£{:.2f} GBP".format((first + second + 199) / 100))]
+        yield Receipt(START + timedelta(hours=position), details, totals)
+
+
+def measure(build: Callable[[int], object], count: int) -> float:
+    parse_money.cache_clear()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build(count)
+    parse_money.cache_clear()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return (after - before) / count
+
+
+if __name__ == '__main__':
+    receipt_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    previous = None
+    for name, build in [("unslotted receipts", lambda count: [UnslottedReceipt(receipt)
+                                                              for receipt in sample_receipts(count)]),
+                        ("slotted receipts", lambda count: list(sample_receipts(count))),
+                        ("receipt batch", lambda count: ReceiptBatch(sample_receipts(count)))]:
+        per_receipt = measure(build, receipt_count)
+        print("{}: {:.0f} bytes per receipt{}".format(
+            name, per_receipt, "" if previous is None else " ({:.1f}x smaller)".format(previous / per_receipt)))
+        previous = previous or per_receipt
@@ -0,0 +1,63 @@
+import datetime
+import sys
+import time
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+from beancount_gmail.email_parser_protocol import EmailParser
+from beancount_gmail.uk_amazon_email import UKAmazonParser
+from beancount_gmail.uk_ebay_email import UKeBayParser
+from beancount_gmail.uk_paypal_email import PayPalUKParser
+from test.tools.benchmarking import read_samples, sample_files, sample_html_pattern
+
+TREE_BUILDERS: list[str] = ["html.parser", "lxml", "html5lib"]
+
+PARSERS: dict[str, EmailParser] = {
+    'amazon': UKAmazonParser(),
+    'ebay': UKeBayParser(),
+    'paypal': PayPalUKParser(),
+}
+
+
+def benchmark_tree_builder(parser: EmailParser, html: list[str], tree_builder: str, repeat: int,
+                           strained: bool = False) -> tuple[float, int]:
+    """ Returns the number of emails parsed and extracted per second, with the parser's strainer if strained, and the
+    number of emails the parser failed on, which are left out of the rate """
+    message_date = datetime.datetime(2021, 1, 1)
+    parse_only = parser.parse_only() if strained else None
+    elapsed = 0.0
+    failures = 0
+    for _ in range(repeat):
+        for email_html in html:
+            start = time.perf_counter()
+            try:
+                parser.extract_receipts(message_date, BeautifulSoup(email_html, tree_builder, parse_only=parse_only))
+            except Exception:
+                failures += 1
+            else:
+                elapsed += time.perf_counter() - start
+    parsed = len(html) * repeat - failures
+    return (parsed / elapsed if elapsed else 0.0), failures
+
+
+def describe(parser: EmailParser, html: list[str], tree_builders: list[str], repeat: int,
+             strained: bool = False) -> str:
+    results = []
+    for builder in tree_builders:
+        if builder_registry.lookup(builder) is None:
+            results.append("{} not installed".format(builder))
+            continue
+        rate, failures = benchmark_tree_builder(parser, html, builder, repeat, strained)
+        results.append("{} {:.1f}/s ({} failed)".format(builder, rate, failures))
+    return ", ".join(results)
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for parser_name, email_parser in PARSERS.items():
+        parser_html = read_samples(sample_files(sample_html_pattern("uk_{}_email".format(parser_name))))
+        print("{} ({} emails): {}".format(parser_name, len(parser_html),
+                                          describe(email_parser, parser_html, TREE_BUILDERS, repeats)))
+        print("{} strained: {}".format(parser_name, describe(email_parser, parser_html, TREE_BUILDERS[:2], repeats,
+                                                             True)))
@@ -0,0 +1,40 @@
+import glob
+import os
+import time
+from typing import Callable, TypeVar
+
+Input = TypeVar('Input')
+Result = TypeVar('Result')
+
+TEST_DIRECTORY: str = os.path.dirname(os.path.dirname(__file__))
+
+
+def sample_html_pattern(parser_directory: str = "*") -> str:
+    return os.path.join(TEST_DIRECTORY, parser_directory, "sample_html", "*")
+
+
+SAMPLE_HTML: str = sample_html_pattern()
+
+
+def sample_files(pattern: str = SAMPLE_HTML) -> list[str]:
+    return sorted(glob.glob(pattern))
+
+
+def read_samples(files: list[str]) -> list[str]:
+    html = []
+    for file in files:
+        with open(file) as sample:
+            html.append(sample.read())
+    return html
+
+
+def time_calls(call: Callable[[Input], Result], inputs: list[Input], repeat: int) -> tuple[float, list[Result]]:
+    """ Returns the seconds taken to call call on every input, repeat times over, and the results of the last pass """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [call(value) for value in inputs]
+    return time.perf_counter() - start, results
+
+
+def mismatches(expected: list, actual: list) -> int:
+    return sum(1 for old, new in zip(expected, actual) if old != new)
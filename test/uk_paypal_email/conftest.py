@@ -3,8 +3,12 @@ import os.path
 import bs4
 from pytest import fixture
 
+from beancount_gmail.common.parsing import TABLES_AND_TITLE
 
-@fixture
-def soup(test_file):
+
+@fixture(params=[("html.parser", None), ("lxml", None), ("html.parser", TABLES_AND_TITLE), ("lxml", TABLES_AND_TITLE)],
+         ids=["html.parser", "lxml", "html.parser-strained", "lxml-strained"])
+def soup(test_file, request):
+    tree_builder, parse_only = request.param
     return lambda file_name: bs4.BeautifulSoup(
-        test_file(os.path.join(os.path.dirname(__file__), file_name)).read(), "html.parser")
+        test_file(os.path.join(os.path.dirname(__file__), file_name)).read(), tree_builder, parse_only=parse_only)